@@ -16,9 +16,14 @@ import torch
 from datetime import datetime
 
 # Import các mô-đun tự tạo
-from modules.pinns_model import optimize_dam_section, generate_force_diagram, plot_loss_history
-from modules.visualization import create_force_diagram, plot_loss_curve, create_excel_report, create_pdf_report
+from modules.pinns_model import generate_force_diagram, plot_loss_history, load_surrogate, surrogate_optimize, EarlyStopping, compute_sensitivities
+from modules.visualization import LOSS_CURVE_POINTS, cached_force_diagram, cached_loss_curve, create_excel_report, create_pdf_report, plot_sensitivity_tornado
 from modules.database import DamDatabase
+from modules.reliability import reliability_analysis, default_distributions
+from modules.governor import get_governor
+from modules.cache import ResultCache, input_hash
+from modules.jobs import JobManager
+from modules.writer import WriteBehindWriter
 
 # Thiết lập trang
 st.set_page_config(
@@ -68,6 +73,41 @@ def get_pdf_download_link(html_content, filename):
 def get_database():
     return DamDatabase("data/dam_results.db")
 
+# Luồng ghi kết quả nền: hiển thị kết quả không phải chờ ghi đĩa
+@st.cache_resource
+def get_result_writer():
+    return WriteBehindWriter(get_database())
+
+# Bộ nhớ đệm kết quả dùng chung cho mọi phiên làm việc
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(get_database(), writer=get_result_writer())
+
+# Quản lý tác vụ nền dùng chung cho mọi phiên làm việc
+@st.cache_resource
+def get_job_manager():
+    return JobManager("data/dam_results.db", cache=get_result_cache())
+
+# Mã tác vụ đang theo dõi được lưu trên URL để gắn lại sau khi tải lại trang
+def get_job_param():
+    if hasattr(st, 'query_params'):
+        return st.query_params.get('job')
+    return st.experimental_get_query_params().get('job', [None])[0]
+
+def set_job_param(job_id):
+    if hasattr(st, 'query_params'):
+        if job_id is None:
+            st.query_params.pop('job', None)
+        else:
+            st.query_params['job'] = job_id
+    else:
+        st.experimental_set_query_params(**({} if job_id is None else {'job': job_id}))
+
+# Tải mô hình thay thế (surrogate) nếu đã được huấn luyện
+@st.cache_resource
+def get_surrogate():
+    return load_surrogate("data/surrogate.pt")
+
 # Hàm chính
 def main():
     # Tải CSS
@@ -107,41 +147,130 @@ def main():
                 
                 st.markdown("#### Thông số tính toán")
                 epochs = st.slider("Số vòng lặp tối đa", min_value=1000, max_value=10000, value=5000, step=1000)
+                engine_labels = {
+                    "PINNs (mạng neural)": 'pinn',
+                    "NumPy (gradient giải tích)": 'numpy',
+                    "Tìm kiếm lưới toàn cục": 'grid'
+                }
+                engine = engine_labels[st.selectbox("Bộ giải", list(engine_labels))]
+                compiled = st.checkbox("Biên dịch hàm mất mát (PINNs, nhanh hơn sau lần chạy đầu)", value=False)
+                use_warm_start = st.checkbox("Khởi tạo từ kết quả gần nhất đã lưu (PINNs)", value=True)
+                
+                surrogate = get_surrogate()
+                use_surrogate = False
+                fine_tune_epochs = 0
+                if surrogate is not None:
+                    use_surrogate = st.checkbox("Dùng mô hình thay thế (phản hồi tức thì)", value=False)
+                    fine_tune_epochs = st.slider("Số vòng lặp tinh chỉnh", min_value=0, max_value=1000, value=0, step=100)
                 
                 # Nút tính toán
                 submitted = st.form_submit_button("Tính toán tối ưu")
             
             # Kiểm tra lịch sử tính toán
-            existing_results = db.search_results(H=H)
-            if not existing_results.empty:
-                st.info(f"Đã có {len(existing_results)} kết quả tính toán trước đó cho H = {H}m trong cơ sở dữ liệu.")
+            existing_count = db.count_results(H=H)
+            if existing_count > 0:
+                st.info(f"Đã có {existing_count} kết quả tính toán trước đó cho H = {H}m trong cơ sở dữ liệu.")
                 if st.button("Xem kết quả đã có"):
-                    result_id = existing_results.iloc[0]['id']
+                    latest, _ = db.get_results_page(['id'], limit=1, H=H)
+                    result_id = int(latest.iloc[0]['id'])
                     st.session_state['result'] = db.get_result_by_id(result_id)
                     st.experimental_rerun()
         
         # Xử lý khi form được gửi
         if submitted:
-            with st.spinner("Đang tính toán tối ưu mặt cắt đập..."):
-                # Thực hiện tính toán
-                result = optimize_dam_section(
-                    H=H,
-                    gamma_bt=gamma_bt,
-                    gamma_n=gamma_n,
-                    f=f,
-                    C=C,
-                    Kc=Kc,
-                    a1=a1,
-                    epochs=epochs,
-                    verbose=False
-                )
+            params = dict(
+                H=H,
+                gamma_bt=gamma_bt,
+                gamma_n=gamma_n,
+                f=f,
+                C=C,
+                Kc=Kc,
+                a1=a1,
+                epochs=epochs,
+                verbose=False,
+                early_stopping=EarlyStopping(),
+                engine=engine
+            )
+            cache = get_result_cache()
+            
+            # Bộ thông số đã được tính: lấy ngay kết quả, không cần xếp hàng
+            result = None if use_surrogate else cache.get(input_hash(**params))
+            
+            if result is None and use_surrogate:
+                with st.spinner("Đang tính toán tối ưu mặt cắt đập..."), get_governor().slot():
+                    result = surrogate_optimize(
+                        surrogate,
+                        H=H,
+                        gamma_bt=gamma_bt,
+                        gamma_n=gamma_n,
+                        f=f,
+                        C=C,
+                        Kc=Kc,
+                        a1=a1,
+                        fine_tune_epochs=fine_tune_epochs
+                    )
                 
-                # Lưu kết quả vào cơ sở dữ liệu
-                db.save_result(result)
+                # Kết quả của mô hình thay thế chỉ là nghiệm gần đúng nên không được lưu: nếu lưu,
+                # bộ thông số này sẽ bị coi là đã giải (khởi tạo từ nghiệm gần nhất, bỏ qua khi
+                # tiếp tục khảo sát tham số) và mỗi lần hỏi lại sẽ thêm một bản ghi trùng
+                st.caption("Kết quả của mô hình thay thế không được lưu vào lịch sử tính toán")
+            elif result is None:
+                warm_start = None
+                if use_warm_start and engine == 'pinn':
+                    neighbor = db.nearest_solution({'H': H, 'gamma_bt': gamma_bt, 'gamma_n': gamma_n,
+                                                    'f': f, 'C': C, 'Kc': Kc, 'a1': a1})
+                    if neighbor is not None:
+                        warm_start = (neighbor['n'], neighbor['m'], neighbor['xi'])
+                
+                # Tính toán chạy nền, kết quả được lưu vào cơ sở dữ liệu bởi tác vụ
+                set_job_param(get_job_manager().submit(**params, compiled=compiled, warm_start=warm_start))
+            
+            if result is not None:
+                if result.get('cached'):
+                    stats = cache.stats()
+                    st.caption(f"Kết quả lấy từ bộ nhớ đệm (trúng {stats['memory_hits'] + stats['db_hits'] + stats['shared_hits']}, "
+                               f"trượt {stats['misses']})")
                 
                 # Lưu kết quả vào session state
                 st.session_state['result'] = result
         
+        # Theo dõi tác vụ nền (kể cả sau khi tải lại trang)
+        job_id = get_job_param()
+        poll_job = False
+        if job_id:
+            jobs = get_job_manager()
+            status = jobs.status(job_id)
+            if status is None:
+                set_job_param(None)
+            elif status['state'] in ('queued', 'running'):
+                if status['state'] == 'queued':
+                    st.info(f"Yêu cầu đang chờ ở vị trí {status['queue_position']} trong hàng đợi...")
+                else:
+                    st.info(f"Đang tính toán tối ưu mặt cắt đập... ({status['elapsed']:.0f} giây)")
+                    progress = status['progress']
+                    if progress is not None:
+                        st.progress(min(progress['epoch'] / progress['epochs'], 1.0))
+                        st.caption(f"Epoch {progress['epoch']}/{progress['epochs']} "
+                                   f"({progress['epochs_per_second']:.0f} epoch/s) - "
+                                   f"n = {progress['n']:.4f}, m = {progress['m']:.4f}, ξ = {progress['xi']:.4f}, "
+                                   f"K = {progress['K']:.4f}, σ = {progress['sigma']:.4f} T/m²")
+                        trace = status['loss_trace']
+                        st.line_chart(pd.DataFrame({
+                            'log10(Loss)': np.log10(np.maximum([loss for _, loss in trace], 1e-12))
+                        }, index=[epoch for epoch, _ in trace]))
+                if st.button("Hủy tính toán"):
+                    jobs.cancel(job_id)
+                poll_job = True
+            else:
+                if status['state'] == 'done':
+                    st.session_state['result'] = jobs.result(job_id)
+                    st.session_state['pending_writes'] = True
+                elif status['state'] == 'failed':
+                    st.error(f"Tính toán thất bại: {status['error']}")
+                else:
+                    st.warning("Tính toán đã bị hủy.")
+                set_job_param(None)
+        
         # Hiển thị kết quả nếu có
         with col2:
             if 'result' in st.session_state:
@@ -175,20 +304,31 @@ def main():
                 
                 # Hiển thị thời gian tính toán
                 st.info(f"Thời gian tính toán: {result['computation_time']:.2f} giây")
+                if result.get('stop_reason') in ('loss_plateau', 'param_drift', 'no_progress'):
+                    st.caption(f"Hội tụ sau {result['stopped_epoch']} vòng lặp ({result['stop_reason']})")
+                if 'optimality_gap' in result:
+                    st.caption(f"Cận dưới diện tích: {result['lower_bound']:.4f} m² "
+                               f"(sai số tối ưu {result['relative_gap'] * 100:.3f}%)")
                 
                 # Tạo tabs cho các biểu đồ
-                result_tabs = st.tabs(["Mặt cắt đập", "Biểu đồ hàm mất mát", "Xuất báo cáo"])
+                result_tabs = st.tabs(["Mặt cắt đập", "Biểu đồ hàm mất mát", "Xuất báo cáo", "Độ tin cậy", "Độ nhạy"])
                 
                 # Tab mặt cắt đập
                 with result_tabs[0]:
-                    # Tạo biểu đồ Plotly tương tác
-                    fig = create_force_diagram(result, interactive=True)
+                    # Tạo biểu đồ Plotly tương tác (vẽ lại chỉ khi mặt cắt thay đổi)
+                    fig = cached_force_diagram(result)
                     st.plotly_chart(fig, use_container_width=True)
                 
                 # Tab biểu đồ hàm mất mát
                 with result_tabs[1]:
+                    # Lịch sử dài được giảm điểm; thu hẹp khoảng epoch để xem chi tiết
+                    last_epoch = max(len(result['loss_history']) - 1, 1)
+                    epoch_range = st.slider("Khoảng epoch", 0, last_epoch, (0, last_epoch), key=f'loss_epoch_range_{last_epoch}')
+                    full_resolution = st.checkbox("Hiển thị mọi điểm", value=False, key='loss_full_resolution')
+                    
                     # Tạo biểu đồ Plotly tương tác
-                    loss_fig = plot_loss_curve(result['loss_history'], interactive=True)
+                    loss_fig = cached_loss_curve(result['loss_history'], None if full_resolution else LOSS_CURVE_POINTS,
+                                                 None if epoch_range == (0, last_epoch) else epoch_range)
                     st.plotly_chart(loss_fig, use_container_width=True)
                 
                 # Tab xuất báo cáo
@@ -217,6 +357,40 @@ def main():
                         if st.button("Cài đặt pdfkit"):
                             os.system("pip install pdfkit")
                             st.success("Đã cài đặt pdfkit. Vui lòng khởi động lại ứng dụng.")
+                
+                # Tab phân tích độ tin cậy
+                with result_tabs[3]:
+                    st.markdown("### Phân tích độ tin cậy (Monte Carlo)")
+                    distributions = default_distributions(result)
+                    st.caption("Phân phối: " + ", ".join(
+                        f"{name} ~ {kind}({a:.3g}, {b:.3g})" for name, (kind, a, b) in distributions.items()))
+                    n_samples = st.select_slider("Số mẫu", options=[100_000, 1_000_000, 10_000_000], value=1_000_000)
+                    if st.button("Phân tích độ tin cậy"):
+                        with st.spinner("Đang lấy mẫu Monte Carlo..."):
+                            reliability = reliability_analysis(result, distributions, n_samples=n_samples)
+                        col_rel1, col_rel2, col_rel3 = st.columns(3)
+                        for column, key, label in ((col_rel1, 'sliding', "P(K < Kc)"),
+                                                   (col_rel2, 'tension', "P(σ > 0)"),
+                                                   (col_rel3, 'failure', "P(phá hoại)")):
+                            low, high = reliability[f'ci_{key}']
+                            column.metric(label, f"{reliability[f'p_{key}']:.4%}")
+                            column.caption(f"KTC {reliability['confidence']:.0%}: [{low:.4%}, {high:.4%}]")
+                        history = reliability['history']
+                        st.line_chart(pd.DataFrame({
+                            "P(K < Kc)": history['sliding'],
+                            "P(σ > 0)": history['tension']
+                        }, index=history['samples']))
+                        st.caption(f"{reliability['n_samples']:,} mẫu trong {reliability['computation_time']:.2f} giây")
+                
+                # Tab phân tích độ nhạy
+                with result_tabs[4]:
+                    sensitivity = compute_sensitivities(result)
+                    output_labels = {"Diện tích A": 'A', "Hệ số ổn định K": 'K', "Ứng suất σ": 'sigma'}
+                    output = output_labels[st.radio("Đại lượng", list(output_labels), horizontal=True)]
+                    tornado_fig = plot_sensitivity_tornado(sensitivity, output=output, interactive=True)
+                    st.plotly_chart(tornado_fig, use_container_width=True)
+                    st.dataframe(pd.DataFrame(sensitivity['jacobian'][0], index=sensitivity['outputs'],
+                                              columns=sensitivity['variables']))
     
     # Tab Lý thuyết
     with tabs[1]:
@@ -280,14 +454,46 @@ def main():
     with tabs[2]:
         st.markdown("### Lịch sử tính toán")
         
-        # Lấy tất cả kết quả từ cơ sở dữ liệu
-        all_results = db.get_all_results()
+        # Kết quả do phiên này tạo ra phải có trong lịch sử: chờ luồng ghi nền ghi xong
+        if st.session_state.pop('pending_writes', False):
+            get_result_writer().flush(timeout=10)
         
-        if all_results.empty:
+        # Chỉ lấy một trang với các cột cần hiển thị; con trỏ của các trang đã xem được giữ
+        # trong session state để quay lại trang trước
+        total = db.count_results()
+        
+        if total == 0:
             st.info("Chưa có kết quả tính toán nào được lưu trong cơ sở dữ liệu.")
         else:
+            sort_options = {'Thời gian': 'timestamp', 'ID': 'id', 'H': 'H', 'A': 'A', 'K': 'K'}
+            sort_col1, sort_col2, sort_col3 = st.columns(3)
+            with sort_col1:
+                sort_label = st.selectbox("Sắp xếp theo", list(sort_options))
+            with sort_col2:
+                descending = st.selectbox("Thứ tự", ["Giảm dần", "Tăng dần"]) == "Giảm dần"
+            with sort_col3:
+                page_size = st.selectbox("Số dòng mỗi trang", [25, 50, 100], index=1)
+            
+            # Đổi cách sắp xếp thì quay về trang đầu
+            page_key = (sort_options[sort_label], descending, page_size)
+            if st.session_state.get('history_page_key') != page_key:
+                st.session_state['history_page_key'] = page_key
+                st.session_state['history_cursors'] = [None]
+            cursors = st.session_state['history_cursors']
+            
+            page, next_cursor = db.get_results_page(
+                ['timestamp', 'H', 'n', 'm', 'xi', 'A', 'K', 'sigma'],
+                sort_by=sort_options[sort_label], descending=descending,
+                after=cursors[-1], limit=page_size
+            )
+            
+            # Trang cuối có thể trống sau khi xóa kết quả: lùi về trang trước
+            if page.empty and len(cursors) > 1:
+                cursors.pop()
+                st.experimental_rerun()
+            
             # Hiển thị bảng kết quả
-            display_df = all_results[['id', 'timestamp', 'H', 'n', 'm', 'xi', 'A', 'K', 'sigma']].copy()
+            display_df = page.copy()
             display_df.columns = ['ID', 'Thời gian', 'H (m)', 'n', 'm', 'ξ', 'A (m²)', 'K', 'σ (T/m²)']
             
             # Format các cột số
@@ -299,6 +505,20 @@ def main():
             
             st.dataframe(display_df, use_container_width=True)
             
+            # Điều hướng giữa các trang
+            page_number = len(cursors)
+            nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+            with nav_col1:
+                if st.button("← Trang trước", disabled=page_number == 1):
+                    cursors.pop()
+                    st.experimental_rerun()
+            with nav_col2:
+                st.caption(f"Trang {page_number}/{-(-total // page_size)} - tổng số {total} kết quả")
+            with nav_col3:
+                if st.button("Trang sau →", disabled=next_cursor is None):
+                    cursors.append(next_cursor)
+                    st.experimental_rerun()
+            
             # Chọn kết quả để xem chi tiết
             selected_id = st.selectbox("Chọn ID để xem chi tiết:", display_df['ID'].tolist())
             
@@ -353,6 +573,11 @@ def main():
         <p>© 2025 Công cụ tính toán tối ưu mặt cắt đập bê tông trọng lực | Phiên bản 1.0</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    # Cập nhật trạng thái tác vụ nền sau khi đã hiển thị toàn bộ trang
+    if poll_job:
+        time.sleep(1)
+        st.experimental_rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,260 @@
+"""
+Mô-đun bộ nhớ đệm kết quả tính toán theo bộ thông số đầu vào
+"""
+
+import copy
+import hashlib
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from modules.pinns_model import OptimizationCancelled, optimize_dam_section
+
+# Các tham số không được đưa vào mã băm: hiển thị, thiết bị và các gợi ý chỉ thay đổi cách
+# tính (biên dịch, khởi tạo từ nghiệm gần nhất - thay đổi mỗi khi cơ sở dữ liệu lớn lên)
+IGNORED_PARAMS = ('verbose', 'device', 'compiled', 'warm_start', 'should_stop', 'progress', 'progress_every')
+
+def canonical_params(**params: Any) -> Dict[str, Any]:
+    """
+    Chuẩn hóa bộ tham số của optimize_dam_section: điền giá trị mặc định, ép kiểu số thực
+    và thay tiêu chí dừng sớm bằng cấu hình của nó
+    
+    Returns:
+        Dict các tham số ảnh hưởng đến kết quả, có thể chuyển thành JSON
+    """
+    bound = inspect.signature(optimize_dam_section).bind(**params)
+    bound.apply_defaults()
+    
+    canonical = {}
+    for name, value in bound.arguments.items():
+        if name in IGNORED_PARAMS:
+            continue
+        if name == 'early_stopping' and value is not None:
+            value = {key: float(item) for key, item in sorted(vars(value).items())}
+        elif isinstance(value, bool) or value is None or isinstance(value, str):
+            pass
+        elif name in ('epochs', 'seed'):
+            value = int(value)
+        else:
+            value = float(value)
+        canonical[name] = value
+    return canonical
+
+def input_hash(**params: Any) -> str:
+    """Mã băm SHA-256 của bộ tham số đã chuẩn hóa (xem canonical_params)"""
+    payload = json.dumps(canonical_params(**params), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class _Call:
+    """Một lần gọi đang thực hiện trong SingleFlight"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Gộp các lần gọi đồng thời cùng khóa thành một lần tính toán
+    
+    Luồng đầu tiên gọi do(key, fn) thực hiện fn; các luồng gọi cùng khóa trong lúc fn đang chạy
+    chờ và nhận chung kết quả (hoặc ngoại lệ) của lần gọi đó thay vì tính lại.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        should_stop: Optional[Callable[[], bool]] = None,
+        poll_interval: float = 0.1
+    ) -> Tuple[Any, bool]:
+        """
+        Args:
+            key: Khóa của phép tính
+            fn: Hàm thực hiện phép tính
+            should_stop: Hàm được kiểm tra mỗi `poll_interval` giây khi đang chờ luồng khác;
+                trả về True để bỏ chờ (ném OptimizationCancelled, lần tính chung vẫn tiếp tục)
+            poll_interval: Chu kỳ kiểm tra should_stop (giây)
+        
+        Returns:
+            Tuple (kết quả, shared) với shared=True nếu kết quả được dùng chung từ luồng khác
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        
+        if not leader:
+            while not call.done.wait(poll_interval):
+                if should_stop is not None and should_stop():
+                    with self._lock:
+                        call.waiters -= 1
+                    raise OptimizationCancelled("Tính toán bị hủy khi đang chờ lần tính dùng chung")
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self) -> int:
+        """Số phép tính đang thực hiện"""
+        with self._lock:
+            return len(self._calls)
+
+class ResultCache:
+    """
+    Bộ nhớ đệm hai tầng quanh optimize_dam_section
+    
+    Tầng thứ nhất là LRU trong bộ nhớ của tiến trình; tầng thứ hai là bảng calculation_results
+    với cột input_hash có chỉ mục UNIQUE. Chỉ khi cả hai tầng đều không có kết quả thì mới
+    thực hiện tính toán, và kết quả mới được ghi vào cả hai tầng. Các yêu cầu giống nhau đến
+    trong lúc đang tính được gộp vào lần tính đó (SingleFlight).
+    """
+    def __init__(self, db: Optional[Any] = None, maxsize: int = 128, writer: Optional[Any] = None):
+        """
+        Args:
+            db: DamDatabase dùng làm tầng lưu trữ lâu dài (nếu None, chỉ dùng bộ nhớ)
+            maxsize: Số kết quả tối đa giữ trong bộ nhớ
+            writer: WriteBehindWriter ghi kết quả mới vào db ở luồng nền (nếu None, ghi trực tiếp)
+        """
+        self.db = db
+        self.writer = writer
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._flight = SingleFlight()
+
+    def _remember(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str, db: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        Tìm kết quả theo mã băm, lần lượt trong bộ nhớ, trong hàng đợi ghi rồi trong cơ sở dữ liệu
+        
+        Args:
+            key: Mã băm (xem input_hash)
+            db: DamDatabase dùng thay cho self.db (ví dụ kết nối riêng của một luồng nền)
+        
+        Returns:
+            Bản sao kết quả (kèm cờ cached=True) hoặc None nếu chưa có
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+        db = self.db if db is None else db
+        if result is None and self.writer is not None:
+            # Kết quả vừa tính nhưng chưa được ghi xuống đĩa
+            result = self.writer.get_pending(key)
+            if result is not None:
+                with self._lock:
+                    self.memory_hits += 1
+        if result is None and db is not None:
+            result = db.get_result_by_hash(key)
+            if result is not None:
+                with self._lock:
+                    self.db_hits += 1
+                self._remember(key, result)
+        if result is None:
+            return None
+        result = copy.deepcopy(result)
+        result['cached'] = True
+        return result
+
+    def optimize(self, db: Optional[Any] = None, **params: Any) -> Dict[str, Any]:
+        """
+        Gọi optimize_dam_section với bộ nhớ đệm
+        
+        Args:
+            db: DamDatabase dùng thay cho self.db (ví dụ kết nối riêng của một luồng nền)
+            params: Các tham số của optimize_dam_section
+        
+        Returns:
+            Dict: Kết quả tính toán, kèm input_hash và cờ cached cho biết kết quả lấy từ bộ nhớ đệm
+        """
+        key = input_hash(**params)
+        db = self.db if db is None else db
+        result = self.get(key, db)
+        if result is not None:
+            return result
+
+        def compute():
+            # Kiểm tra lại: một lần tính cùng khóa có thể vừa kết thúc
+            cached = self.get(key, db)
+            if cached is not None:
+                return cached
+            with self._lock:
+                self.misses += 1
+            computed = optimize_dam_section(**params)
+            computed['input_hash'] = key
+            if self.writer is not None and db is self.writer.db:
+                self.writer.submit(computed)
+            elif db is not None:
+                computed['id'] = db.save_result(computed)
+            self._remember(key, computed)
+            return computed
+        
+        should_stop = params.get('should_stop')
+        while True:
+            try:
+                result, shared = self._flight.do(key, compute, should_stop)
+                break
+            except OptimizationCancelled:
+                # Lần tính được dùng chung bị hủy bởi người khác: tự tính lại nếu mình chưa hủy
+                if should_stop is None or should_stop():
+                    raise
+        
+        result = copy.deepcopy(result)
+        if shared:
+            with self._lock:
+                self.shared_hits += 1
+            result['cached'] = True
+        else:
+            result.setdefault('cached', False)
+        return result
+
+    def clear(self) -> None:
+        """Xóa tầng bộ nhớ (không ảnh hưởng đến cơ sở dữ liệu)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Số lần trúng bộ nhớ, trúng cơ sở dữ liệu, dùng chung lần tính đang chạy, trượt và tỉ lệ trúng"""
+        with self._lock:
+            hits = self.memory_hits + self.db_hits + self.shared_hits
+            total = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'in_flight': self._flight.in_flight(),
+                'hit_rate': hits / total if total else 0.0,
+                'size': len(self._entries)
+            }
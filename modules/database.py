@@ -3,33 +3,182 @@ Mô-đun cơ sở dữ liệu cho ứng dụng tính toán tối ưu mặt cắt
 """
 
 import sqlite3
+import numpy as np
 import pandas as pd
 import os
 import json
-from typing import Dict, List, Optional, Any, Tuple
+import itertools
+import threading
+import weakref
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple, Union
 from datetime import datetime
 
+from modules.numpy_engine import DEFAULT_INPUTS, INPUT_NAMES, INPUT_BOUNDS
+
+# Các cột của calculation_results trả về trong các truy vấn danh sách (không gồm lịch sử mất mát)
+RESULT_COLUMNS = (
+    'id', 'timestamp', 'H', 'gamma_bt', 'gamma_n', 'f', 'C', 'Kc', 'a1',
+    'n', 'm', 'xi', 'A', 'K', 'sigma', 'computation_time', 'input_hash'
+)
+
+# Các cột số có thể lọc theo khoảng trong search_results
+RANGE_COLUMNS = INPUT_NAMES + ('n', 'm', 'xi', 'A', 'K', 'sigma', 'computation_time')
+
+# Chỉ mục phụ của calculation_results: (H, K) phục vụ cả lọc theo H, bộ 7 thông số đầu vào
+# phục vụ tra cứu kịch bản, timestamp phục vụ sắp xếp danh sách
+RESULT_INDEXES = {
+    'idx_results_H_K': ('H', 'K'),
+    'idx_results_timestamp': ('timestamp',),
+    'idx_results_inputs': INPUT_NAMES
+}
+
+# Thời gian chờ khi cơ sở dữ liệu đang bị khóa bởi một kết nối khác (giây)
+BUSY_TIMEOUT = 5.0
+
+# Thiết lập cho mỗi kết nối: WAL cho phép đọc song song với ghi, synchronous=NORMAL là đủ an toàn
+# với WAL (chỉ có thể mất giao dịch cuối khi mất điện, không làm hỏng dữ liệu)
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 134217728'
+)
+
+# Các cột được ghi bởi save_result và save_results_many (ngoài timestamp)
+INSERT_COLUMNS = INPUT_NAMES + ('n', 'm', 'xi', 'A', 'K', 'sigma', 'computation_time', 'input_hash')
+
+INSERT_RESULT_SQL = f'''
+INSERT INTO calculation_results (timestamp, {", ".join(INSERT_COLUMNS)})
+VALUES ({", ".join("?" * (len(INSERT_COLUMNS) + 1))})
+'''
+
+def encode_loss_history(loss_history: List[float]) -> bytes:
+    """Nén lịch sử mất mát thành BLOB: mảng float32 little-endian nén bằng zlib"""
+    return zlib.compress(np.asarray(loss_history, dtype='<f4').tobytes())
+
+def decode_loss_history(blob: bytes) -> List[float]:
+    """Giải nén BLOB tạo bởi encode_loss_history thành list số thực"""
+    return np.frombuffer(zlib.decompress(blob), dtype='<f4').astype(float).tolist()
+
+def _hash_of(result: Dict[str, Any]) -> Optional[str]:
+    """input_hash của một kết quả (None nếu không có, kể cả ô NaN của DataFrame)"""
+    key = result.get('input_hash')
+    return key if isinstance(key, str) else None
+
+def _timestamp_of(result: Dict[str, Any]) -> Optional[str]:
+    """Thời điểm tính của một kết quả (None nếu không có, kể cả ô NaN của DataFrame)"""
+    timestamp = result.get('timestamp')
+    return timestamp if isinstance(timestamp, str) and timestamp else None
+
+def _loss_history_of(result: Dict[str, Any]) -> List[float]:
+    """Lịch sử mất mát của một kết quả (rỗng nếu không có, ví dụ ô NaN của DataFrame)"""
+    loss_history = result.get('loss_history')
+    if loss_history is None or isinstance(loss_history, float):
+        return []
+    return loss_history
+
+def _close_connection(conn: sqlite3.Connection) -> None:
+    """Đóng một kết nối, trước đó cập nhật thống kê của chỉ mục nếu cần (khuyến nghị của SQLite)"""
+    try:
+        conn.execute('PRAGMA optimize')
+    except sqlite3.Error:
+        pass
+    conn.close()
+
+def _release_connection(conn: sqlite3.Connection, connections: List[sqlite3.Connection], lock: threading.Lock) -> None:
+    """Đóng kết nối của một luồng đã kết thúc (bỏ qua nếu DamDatabase.close đã đóng nó)"""
+    with lock:
+        if conn not in connections:
+            return
+        connections.remove(conn)
+    _close_connection(conn)
+
+class ResultBatch:
+    """
+    Bộ gom kết quả cho chế độ ghi theo lô (xem DamDatabase.batch)
+    
+    Các kết quả được giữ trong bộ nhớ và ghi bằng save_results_many mỗi khi đủ `chunk_size`.
+    """
+    def __init__(self, db: 'DamDatabase', chunk_size: int = 1000):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.pending = []
+        self.ids = []
+
+    def add(self, result: Dict[str, Any]) -> None:
+        """Thêm một kết quả; ghi xuống cơ sở dữ liệu khi bộ gom đầy"""
+        self.pending.append(result)
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Ghi các kết quả đang chờ (ID được nối vào self.ids)"""
+        if self.pending:
+            self.ids.extend(self.db.save_results_many(self.pending, chunk_size=self.chunk_size))
+            self.pending = []
+
 class DamDatabase:
     """
     Lớp quản lý cơ sở dữ liệu SQLite cho ứng dụng tính toán tối ưu mặt cắt đập bê tông
+    
+    Một đối tượng có thể dùng chung giữa nhiều luồng (các phiên Streamlit, tác vụ nền): mỗi luồng
+    có kết nối riêng (thuộc tính conn), được đóng khi luồng kết thúc; cơ sở dữ liệu chạy ở chế độ
+    WAL nên đọc và ghi không chặn nhau, còn các thao tác ghi trong tiến trình được tuần tự hóa
+    bằng một khóa.
     """
     
-    def __init__(self, db_path: str = "data/dam_results.db"):
+    def __init__(self, db_path: str = "data/dam_results.db", busy_timeout: float = BUSY_TIMEOUT):
         """
         Khởi tạo kết nối đến cơ sở dữ liệu
         
         Args:
             db_path: Đường dẫn đến file cơ sở dữ liệu SQLite
+            busy_timeout: Thời gian chờ khi cơ sở dữ liệu đang bị khóa bởi tiến trình khác (giây)
         """
         # Đảm bảo thư mục tồn tại
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        # Chỉ mục láng giềng gần nhất (xem build_neighbor_index), xây dựng khi cần đến
+        self._index_ids = None
+        self._index_points = None
+        self._index_solutions = None
         self.create_tables()
     
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Kết nối của luồng hiện tại (tạo ở lần dùng đầu tiên)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+            # Đóng kết nối khi luồng kết thúc (Streamlit chạy mỗi lần tải lại trên một luồng mới);
+            # hàm hủy chỉ giữ tham chiếu đến kết nối và danh sách, không giữ đối tượng DamDatabase.
+            # Không chạy khi tiến trình kết thúc để luồng ghi nền còn kết nối khi ghi nốt hàng đợi
+            finalizer = weakref.finalize(threading.current_thread(), _release_connection, conn,
+                                         self._connections, self._connections_lock)
+            finalizer.atexit = False
+        return conn
+    
     def create_tables(self):
         """Tạo các bảng cần thiết nếu chưa tồn tại"""
+        with self._write_lock:
+            self._create_tables()
+    
+    def _create_tables(self):
+        """Thân của create_tables, gọi khi đã giữ khóa ghi"""
         cursor = self.conn.cursor()
         
         # Tạo bảng lưu kết quả tính toán
@@ -51,11 +200,72 @@ class DamDatabase:
             K REAL,
             sigma REAL,
             loss_history TEXT,
-            computation_time REAL
+            computation_time REAL,
+            input_hash TEXT
+        )
+        ''')
+        
+        # Nâng cấp cơ sở dữ liệu cũ: thêm cột input_hash nếu chưa có
+        cursor.execute('PRAGMA table_info(calculation_results)')
+        if 'input_hash' not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE calculation_results ADD COLUMN input_hash TEXT')
+        
+        # Mỗi bộ thông số tính toán (xem modules/cache.py) chỉ có một kết quả; các bản ghi
+        # không có input_hash (NULL) không bị ràng buộc
+        cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_results_input_hash
+        ON calculation_results (input_hash)
+        ''')
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'calculation_results'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in RESULT_INDEXES if name not in existing]
+        for name in missing:
+            cursor.execute(f'CREATE INDEX {name} ON calculation_results ({", ".join(RESULT_INDEXES[name])})')
+        if missing:
+            # Thống kê phân bố giúp SQLite chọn đúng chỉ mục (kể cả skip-scan theo cột giữa chỉ mục)
+            cursor.execute('ANALYZE calculation_results')
+        
+        # Lịch sử mất mát lưu riêng dạng nhị phân nén, chỉ đọc khi cần (get_result_by_id);
+        # cột loss_history cũ được giữ lại để tương thích nhưng để trống
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS loss_histories (
+            result_id INTEGER PRIMARY KEY REFERENCES calculation_results (id) ON DELETE CASCADE,
+            n_points INTEGER,
+            data BLOB
         )
         ''')
         
         self.conn.commit()
+        self._migrate_loss_histories()
+    
+    def _migrate_loss_histories(self, batch_size: int = 500):
+        """Chuyển các lịch sử mất mát dạng JSON trong calculation_results sang bảng loss_histories"""
+        cursor = self.conn.cursor()
+        migrated = 0
+        while True:
+            cursor.execute('''
+            SELECT id, loss_history FROM calculation_results
+            WHERE loss_history IS NOT NULL LIMIT ?
+            ''', (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            histories = []
+            for result_id, loss_history_json in rows:
+                loss_history = json.loads(loss_history_json)
+                histories.append((result_id, len(loss_history), encode_loss_history(loss_history)))
+            cursor.executemany('INSERT OR REPLACE INTO loss_histories (result_id, n_points, data) VALUES (?, ?, ?)',
+                               histories)
+            cursor.executemany('UPDATE calculation_results SET loss_history = NULL WHERE id = ?',
+                               [(row[0],) for row in rows])
+            self.conn.commit()
+            migrated += len(rows)
+        
+        if migrated:
+            # Thu hồi dung lượng của các chuỗi JSON đã xóa
+            self.conn.execute('VACUUM')
     
     def save_result(self, result: Dict[str, Any]) -> int:
         """
@@ -67,28 +277,249 @@ class DamDatabase:
         Returns:
             ID của bản ghi vừa thêm
         """
+        with self._write_lock:
+            return self._save_result(result)
+    
+    def _save_result(self, result: Dict[str, Any]) -> int:
+        """Thân của save_result, gọi khi đã giữ khóa ghi"""
         cursor = self.conn.cursor()
         
-        # Chuyển đổi loss_history thành chuỗi JSON
-        loss_history_json = json.dumps(result['loss_history'])
-        
         # Thêm timestamp hiện tại
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        cursor.execute('''
-        INSERT INTO calculation_results (
-            timestamp, H, gamma_bt, gamma_n, f, C, Kc, a1,
-            n, m, xi, A, K, sigma, loss_history, computation_time
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            timestamp, result['H'], result['gamma_bt'], result['gamma_n'],
-            result['f'], result['C'], result['Kc'], result['a1'],
-            result['n'], result['m'], result['xi'], result['A'],
-            result['K'], result['sigma'], loss_history_json, result['computation_time']
+        try:
+            cursor.execute(INSERT_RESULT_SQL, (timestamp,) + tuple(result.get(name) for name in INSERT_COLUMNS))
+        except sqlite3.IntegrityError:
+            # Cùng bộ thông số đã được lưu (ví dụ bởi một phiên khác): giữ bản ghi cũ
+            self.conn.rollback()
+            cursor.execute('SELECT id FROM calculation_results WHERE input_hash = ?', (result['input_hash'],))
+            return cursor.fetchone()[0]
+        
+        loss_history = _loss_history_of(result)
+        cursor.execute('INSERT INTO loss_histories (result_id, n_points, data) VALUES (?, ?, ?)', (
+            cursor.lastrowid, len(loss_history), encode_loss_history(loss_history)
         ))
         
         self.conn.commit()
+        self._add_to_index([cursor.lastrowid], [result])
         return cursor.lastrowid
+
+    def save_results_many(self, results: Union[Iterable[Dict[str, Any]], pd.DataFrame], chunk_size: int = 5000) -> List[int]:
+        """
+        Lưu nhiều kết quả tính toán bằng executemany
+        
+        Mỗi nhóm `chunk_size` kết quả được ghi trong một giao dịch (một lần commit), nên bộ nhớ
+        bị chặn theo chunk_size dù đầu vào là generator rất dài. Kết quả có input_hash đã tồn tại
+        (hoặc trùng trong cùng lô) không được ghi lại, giống save_result. Kết quả có sẵn
+        timestamp (ví dụ dữ liệu nhập lại từ modules/export.py) giữ nguyên thời điểm đó.
+        
+        Args:
+            results: Iterable các dict kết quả hoặc DataFrame với các cột tương ứng
+                (cột loss_history không bắt buộc)
+            chunk_size: Số kết quả trong một giao dịch
+        
+        Returns:
+            Danh sách ID theo thứ tự đầu vào (ID của bản ghi cũ với các kết quả trùng)
+        """
+        if isinstance(results, pd.DataFrame):
+            frame = results
+            results = (row for start in range(0, len(frame), chunk_size)
+                       for row in frame.iloc[start:start + chunk_size].to_dict('records'))
+        
+        ids = []
+        iterator = iter(results)
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            with self._write_lock:
+                ids.extend(self._save_chunk(chunk))
+        return ids
+
+    def _save_chunk(self, chunk: List[Dict[str, Any]]) -> List[int]:
+        """Ghi một nhóm kết quả trong một giao dịch, gọi khi đã giữ khóa ghi"""
+        conn = self.conn
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            # Giữ khóa ghi của cơ sở dữ liệu từ đầu để ID mới liên tục và không lẫn với tiến trình khác
+            conn.execute('BEGIN IMMEDIATE')
+            
+            # Kết quả đã có trong cơ sở dữ liệu hoặc trùng với kết quả trước đó trong lô
+            hashes = list({_hash_of(result) for result in chunk} - {None})
+            existing = {}
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = conn.execute(f'''
+                SELECT input_hash, id FROM calculation_results
+                WHERE input_hash IN ({", ".join("?" * len(part))})
+                ''', part).fetchall()
+                existing.update(rows)
+            
+            new_rows = []
+            inserted = []
+            seen = set()
+            for result in chunk:
+                key = _hash_of(result)
+                inserted.append(key is None or (key not in existing and key not in seen))
+                if inserted[-1]:
+                    seen.add(key)
+                    new_rows.append(result)
+            
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM calculation_results').fetchone()[0]
+            conn.executemany(INSERT_RESULT_SQL, [
+                (_timestamp_of(result) or timestamp,)
+            + tuple(result.get(name) for name in INSERT_COLUMNS[:-1]) + (_hash_of(result),)
+            for result in new_rows
+            ])
+            new_ids = [row[0] for row in conn.execute(
+                'SELECT id FROM calculation_results WHERE id > ? ORDER BY id', (last_id,)
+            )]
+            histories = [_loss_history_of(result) for result in new_rows]
+            conn.executemany('INSERT INTO loss_histories (result_id, n_points, data) VALUES (?, ?, ?)', [
+                (result_id, len(history), encode_loss_history(history)) for result_id, history in zip(new_ids, histories)
+            ])
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        self._add_to_index(new_ids, new_rows)
+        existing.update((_hash_of(result), result_id) for result, result_id in zip(new_rows, new_ids))
+        new_id_iter = iter(new_ids)
+        return [next(new_id_iter) if is_new else existing[_hash_of(result)]
+                for result, is_new in zip(chunk, inserted)]
+
+    @contextmanager
+    def batch(self, chunk_size: int = 1000) -> Iterator[ResultBatch]:
+        """
+        Chế độ ghi theo lô cho nguồn kết quả liên tục
+        
+        Ví dụ:
+            with db.batch() as batch:
+                for result in run_sweep(scenarios):
+                    batch.add(result)
+        
+        Các kết quả còn lại được ghi khi thoát khỏi khối lệnh, kể cả khi có ngoại lệ, để các
+        kết quả đã tính không bị mất.
+        
+        Args:
+            chunk_size: Số kết quả được gom trước mỗi lần ghi
+        """
+        batch = ResultBatch(self, chunk_size)
+        try:
+            yield batch
+        finally:
+            batch.flush()
+    
+    @staticmethod
+    def _normalize_inputs(values: np.ndarray) -> np.ndarray:
+        """Chuẩn hóa các cột (H, gamma_bt, gamma_n, f, C, Kc, a1) về [0, 1] theo INPUT_BOUNDS"""
+        lows = np.array([INPUT_BOUNDS[name][0] for name in INPUT_NAMES])
+        highs = np.array([INPUT_BOUNDS[name][1] for name in INPUT_NAMES])
+        return (np.asarray(values, dtype=float) - lows) / (highs - lows)
+    
+    def build_neighbor_index(self, chunk_size: int = 50000):
+        """
+        Xây dựng chỉ mục láng giềng gần nhất từ bảng calculation_results
+        
+        Chỉ mục giữ trong bộ nhớ các thông số đầu vào đã chuẩn hóa và nghiệm (n, m, xi) của mọi
+        bản ghi; save_result và delete_result cập nhật chỉ mục nên không cần xây dựng lại.
+        nearest_solution tự gọi hàm này ở lần dùng đầu tiên. Các dòng được đọc theo từng nhóm
+        thẳng vào mảng cấp phát trước, nên bộ nhớ tạm không tăng theo số bản ghi.
+        
+        Args:
+            chunk_size: Số dòng đọc mỗi lần
+        """
+        # Giữ khóa ghi trong lúc đọc để không bỏ sót kết quả được lưu cùng lúc
+        with self._write_lock:
+            total = self.conn.execute('SELECT COUNT(*) FROM calculation_results').fetchone()[0]
+            ids = np.empty(total, dtype=np.int64)
+            points = np.empty((total, len(INPUT_NAMES)))
+            solutions = np.empty((total, 3))
+        
+            cursor = self.conn.execute(f'''
+            SELECT id, {', '.join(INPUT_NAMES)}, n, m, xi FROM calculation_results LIMIT ?
+            ''', (total,))
+            filled = 0
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                # Giá trị NULL trở thành NaN
+                rows = np.array(rows, dtype=float)
+                stop = filled + len(rows)
+                ids[filled:stop] = rows[:, 0]
+                points[filled:stop] = self._normalize_inputs(rows[:, 1:len(INPUT_NAMES) + 1])
+                solutions[filled:stop] = rows[:, len(INPUT_NAMES) + 1:]
+                filled = stop
+            
+            # Bỏ các bản ghi thiếu giá trị (và phần mảng thừa nếu tiến trình khác vừa xóa bớt dòng)
+            valid = np.isfinite(points[:filled]).all(axis=1) & np.isfinite(solutions[:filled]).all(axis=1)
+            if filled < total or not valid.all():
+                ids, points, solutions = ids[:filled][valid], points[:filled][valid], solutions[:filled][valid]
+            self._index_ids = ids
+            self._index_points = points
+            self._index_solutions = solutions
+    
+    def _add_to_index(self, result_ids: List[int], results: List[Dict[str, Any]]):
+        """Thêm các kết quả vừa lưu vào chỉ mục láng giềng gần nhất"""
+        if not results or self._index_ids is None:
+            # Chỉ mục chưa được xây dựng: các kết quả này sẽ được đọc từ bảng khi xây dựng
+            return
+        values = np.array([[result[name] for name in INPUT_NAMES] for result in results], dtype=float)
+        solutions = np.array([[result['n'], result['m'], result['xi']] for result in results], dtype=float)
+        valid = np.isfinite(values).all(axis=1) & np.isfinite(solutions).all(axis=1)
+        self._index_ids = np.append(self._index_ids, np.asarray(result_ids, dtype=int)[valid])
+        self._index_points = np.vstack([self._index_points, self._normalize_inputs(values[valid])])
+        self._index_solutions = np.vstack([self._index_solutions, solutions[valid]])
+    
+    def nearest_solution(self, inputs: Dict[str, float], max_distance: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Tìm nghiệm đã lưu có thông số đầu vào gần nhất (khoảng cách Euclid sau chuẩn hóa)
+        
+        Args:
+            inputs: Dict các thông số H, gamma_bt, gamma_n, f, C, Kc, a1 (H bắt buộc, thiếu thông số khác thì dùng giá trị mặc định)
+            max_distance: Khoảng cách tối đa được chấp nhận (nếu None, không giới hạn)
+            
+        Returns:
+            Dictionary gồm id, n, m, xi và distance của bản ghi gần nhất, hoặc None nếu không có
+        """
+        # Ảnh chụp của chỉ mục: các mảng được thay thế (không sửa tại chỗ) khi ghi
+        with self._write_lock:
+            if self._index_ids is None:
+                self.build_neighbor_index()
+            ids, points, solutions = self._index_ids, self._index_points, self._index_solutions
+        if len(ids) == 0:
+            return None
+        
+        query = self._normalize_inputs([inputs[name] if name in inputs else DEFAULT_INPUTS[name] for name in INPUT_NAMES])
+        distances = np.sqrt(((points - query) ** 2).sum(axis=1))
+        i = int(np.argmin(distances))
+        if max_distance is not None and distances[i] > max_distance:
+            return None
+        
+        n, m, xi = solutions[i]
+        return {
+            'id': int(ids[i]),
+            'n': float(n),
+            'm': float(m),
+            'xi': float(xi),
+            'distance': float(distances[i])
+        }
+    
+    def get_stored_inputs(self, decimals: int = 6) -> set:
+        """
+        Lấy tập các bộ thông số đầu vào đã có kết quả, dùng để bỏ qua các kịch bản đã tính
+        
+        Args:
+            decimals: Số chữ số thập phân khi làm tròn để so khớp
+            
+        Returns:
+            Tập các tuple (H, gamma_bt, gamma_n, f, C, Kc, a1) đã làm tròn
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT {", ".join(INPUT_NAMES)} FROM calculation_results')
+        return {tuple(round(float(value), decimals) for value in row) for row in cursor.fetchall()}
     
     def get_result_by_id(self, result_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -113,59 +544,263 @@ class DamDatabase:
         # Tạo dictionary từ kết quả truy vấn
         result = dict(zip(columns, row))
         
-        # Chuyển đổi chuỗi JSON thành list
-        result['loss_history'] = json.loads(result['loss_history'])
+        # Đọc lịch sử mất mát từ bảng riêng
+        cursor.execute('SELECT data FROM loss_histories WHERE result_id = ?', (result_id,))
+        history = cursor.fetchone()
+        if history is not None:
+            result['loss_history'] = decode_loss_history(history[0])
+        else:
+            result['loss_history'] = json.loads(result['loss_history']) if result['loss_history'] else []
         
         return result
     
-    def get_all_results(self) -> pd.DataFrame:
+    def get_result_by_hash(self, input_hash: str) -> Optional[Dict[str, Any]]:
         """
-        Lấy tất cả kết quả tính toán
+        Lấy kết quả tính toán theo mã băm của bộ thông số tính toán
         
+        Args:
+            input_hash: Mã băm (xem modules/cache.py)
+            
         Returns:
-            DataFrame chứa tất cả kết quả tính toán
+            Dictionary chứa kết quả tính toán hoặc None nếu không tìm thấy
         """
-        query = 'SELECT * FROM calculation_results ORDER BY timestamp DESC'
-        df = pd.read_sql_query(query, self.conn)
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id FROM calculation_results WHERE input_hash = ?', (input_hash,))
+        row = cursor.fetchone()
         
-        # Chuyển đổi chuỗi JSON thành list
-        if not df.empty and 'loss_history' in df.columns:
-            df['loss_history'] = df['loss_history'].apply(json.loads)
+        if row is None:
+            return None
         
-        return df
+        return self.get_result_by_id(row[0])
     
-    def search_results(self, H: Optional[float] = None, min_K: Optional[float] = None) -> pd.DataFrame:
+    def iter_result_chunks(
+        self,
+        chunk_size: int = 50000,
+        include_loss_history: bool = False,
+        max_id: Optional[int] = None
+    ) -> Iterator[pd.DataFrame]:
         """
-        Tìm kiếm kết quả tính toán theo các tiêu chí
+        Đọc bảng calculation_results theo từng nhóm `chunk_size` dòng, theo thứ tự id
+        
+        Mỗi nhóm là một truy vấn riêng bắt đầu sau id cuối của nhóm trước, nên bộ nhớ chỉ phụ
+        thuộc chunk_size và các luồng khác vẫn ghi được giữa hai nhóm.
         
         Args:
-            H: Chiều cao đập (nếu None, không lọc theo chiều cao)
-            min_K: Hệ số ổn định tối thiểu (nếu None, không lọc theo hệ số ổn định)
+            chunk_size: Số dòng mỗi nhóm
+            include_loss_history: Kèm cột loss_history (mảng float32 của từng dòng)
+            max_id: Chỉ đọc các dòng có id ≤ max_id (nếu None, lấy id lớn nhất lúc bắt đầu đọc)
             
+        Yields:
+            DataFrame với các cột RESULT_COLUMNS (và loss_history nếu được yêu cầu)
+        """
+        if max_id is None:
+            max_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM calculation_results').fetchone()[0]
+        columns = ', '.join(f'r.{column}' for column in RESULT_COLUMNS)
+        if include_loss_history:
+            query = f'''
+            SELECT {columns}, h.data FROM calculation_results r
+            LEFT JOIN loss_histories h ON h.result_id = r.id
+            WHERE r.id > ? AND r.id <= ? ORDER BY r.id LIMIT ?
+            '''
+        else:
+            query = f'SELECT {columns} FROM calculation_results r WHERE r.id > ? AND r.id <= ? ORDER BY r.id LIMIT ?'
+        
+        last_id = 0
+        while True:
+            rows = self.conn.execute(query, (last_id, max_id, chunk_size)).fetchall()
+            if not rows:
+                return
+            chunk = pd.DataFrame([row[:len(RESULT_COLUMNS)] for row in rows], columns=list(RESULT_COLUMNS))
+            if include_loss_history:
+                empty = np.empty(0, dtype=np.float32)
+                chunk['loss_history'] = [
+                    np.frombuffer(zlib.decompress(row[-1]), dtype='<f4') if row[-1] is not None else empty
+                    for row in rows
+                ]
+            last_id = int(rows[-1][0])
+            yield chunk
+    
+    def get_all_results(self) -> pd.DataFrame:
+        """
+        Lấy tất cả kết quả tính toán
+        
         Returns:
-            DataFrame chứa kết quả tìm kiếm
+            DataFrame chứa tất cả kết quả tính toán (không gồm lịch sử mất mát,
+            dùng get_result_by_id để lấy đầy đủ một kết quả)
         """
-        query = 'SELECT * FROM calculation_results WHERE 1=1'
+        query = f'SELECT {", ".join(RESULT_COLUMNS)} FROM calculation_results ORDER BY timestamp DESC'
+        return pd.read_sql_query(query, self.conn)
+    
+    @staticmethod
+    def _filter_clause(
+        H: Optional[float] = None,
+        min_K: Optional[float] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None
+    ) -> Tuple[str, List[Any]]:
+        """
+        Tạo mệnh đề WHERE cho các tiêu chí tìm kiếm (xem search_results)
+        
+        Returns:
+            Tuple (điều kiện SQL, danh sách tham số)
+        """
+        conditions = ['1=1']
         params = []
         
         if H is not None:
             # Tìm kiếm với sai số 0.01
-            query += ' AND ABS(H - ?) < 0.01'
-            params.append(H)
+            conditions.append('H > ? AND H < ?')
+            params.extend([H - 0.01, H + 0.01])
         
         if min_K is not None:
-            query += ' AND K >= ?'
+            conditions.append('K >= ?')
             params.append(min_K)
         
-        query += ' ORDER BY timestamp DESC'
+        for column, (low, high) in (ranges or {}).items():
+            if column not in RANGE_COLUMNS:
+                raise ValueError(f"Không lọc được theo cột: {column} (chọn trong {RANGE_COLUMNS})")
+            if low is not None:
+                conditions.append(f'{column} >= ?')
+                params.append(low)
+            if high is not None:
+                conditions.append(f'{column} <= ?')
+                params.append(high)
         
-        df = pd.read_sql_query(query, self.conn, params=params)
+        return ' AND '.join(conditions), params
+    
+    def search_results(
+        self,
+        H: Optional[float] = None,
+        min_K: Optional[float] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None
+    ) -> pd.DataFrame:
+        """
+        Tìm kiếm kết quả tính toán theo các tiêu chí
         
-        # Chuyển đổi chuỗi JSON thành list
-        if not df.empty and 'loss_history' in df.columns:
-            df['loss_history'] = df['loss_history'].apply(json.loads)
+        Mọi điều kiện đều là so sánh trực tiếp trên cột nên SQLite dùng được các chỉ mục
+        trong RESULT_INDEXES.
         
-        return df
+        Args:
+            H: Chiều cao đập (nếu None, không lọc theo chiều cao)
+            min_K: Hệ số ổn định tối thiểu (nếu None, không lọc theo hệ số ổn định)
+            ranges: Dict ánh xạ tên cột trong RANGE_COLUMNS sang khoảng (cận dưới, cận trên),
+                hai cận đều được tính; cận None là không giới hạn. Ví dụ {'f': (0.6, 0.8), 'A': (None, 900)}
+            
+        Returns:
+            DataFrame chứa kết quả tìm kiếm (không gồm lịch sử mất mát)
+        """
+        where, params = self._filter_clause(H, min_K, ranges)
+        query = f'SELECT {", ".join(RESULT_COLUMNS)} FROM calculation_results WHERE {where}'
+        
+        # Khi có điều kiện lọc, '+' ngăn SQLite duyệt cả bảng theo chỉ mục timestamp chỉ để tránh
+        # sắp xếp: tìm theo chỉ mục của điều kiện rồi sắp xếp tập kết quả nhỏ nhanh hơn nhiều
+        query += ' ORDER BY +timestamp DESC' if params else ' ORDER BY timestamp DESC'
+        
+        return pd.read_sql_query(query, self.conn, params=params)
+    
+    def get_results_page(
+        self,
+        columns: Optional[List[str]] = None,
+        sort_by: str = 'timestamp',
+        descending: bool = True,
+        after: Optional[Tuple[Any, int]] = None,
+        limit: int = 50,
+        H: Optional[float] = None,
+        min_K: Optional[float] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None
+    ) -> Tuple[pd.DataFrame, Optional[Tuple[Any, int]]]:
+        """
+        Lấy một trang kết quả tính toán với phân trang theo khóa (keyset pagination)
+        
+        Trang tiếp theo bắt đầu ngay sau bản ghi cuối của trang trước theo (sort_by, id), nên mỗi
+        trang chỉ đọc `limit` dòng dù đang ở trang nào; với sort_by có chỉ mục (timestamp, H)
+        thời gian truy vấn không phụ thuộc số bản ghi đã lưu. Bản ghi có sort_by là NULL (ví dụ
+        computation_time của dữ liệu nhập từ nơi khác) đứng cuối khi giảm dần, đứng đầu khi tăng dần.
+        
+        Args:
+            columns: Các cột cần lấy trong RESULT_COLUMNS (nếu None, tất cả); luôn kèm id
+            sort_by: Cột sắp xếp: id, timestamp hoặc một cột trong RANGE_COLUMNS
+            descending: Sắp xếp giảm dần
+            after: Con trỏ của trang trước (giá trị thứ hai trả về), None cho trang đầu
+            limit: Số bản ghi tối đa của trang (ít nhất 1)
+            H, min_K, ranges: Tiêu chí lọc (xem search_results)
+            
+        Returns:
+            Tuple (DataFrame của trang, con trỏ của trang tiếp theo hoặc None nếu đã hết)
+        """
+        if sort_by not in ('id', 'timestamp') + RANGE_COLUMNS:
+            raise ValueError(f"Không sắp xếp được theo cột: {sort_by}")
+        if limit < 1:
+            raise ValueError(f"Số bản ghi của trang phải lớn hơn 0: {limit}")
+        columns = list(RESULT_COLUMNS) if columns is None else list(columns)
+        unknown = set(columns) - set(RESULT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cột không hợp lệ: {sorted(unknown)}")
+        selected = ['id'] + [column for column in columns if column != 'id']
+        if sort_by not in selected:
+            selected.append(sort_by)
+        
+        where, params = self._filter_clause(H, min_K, ranges)
+        direction = 'DESC' if descending else 'ASC'
+        query = f'''
+        SELECT {", ".join(selected)} FROM calculation_results WHERE {where} AND {{segment}}
+        ORDER BY {sort_by} {direction}, id {direction} LIMIT ?
+        '''
+        
+        pages = []
+        remaining = limit
+        for segment, segment_params in self._page_segments(sort_by, descending, after):
+            page = pd.read_sql_query(query.format(segment=segment), self.conn,
+                                     params=params + segment_params + [remaining])
+            pages.append(page)
+            remaining -= len(page)
+            if remaining <= 0:
+                break
+        page = pd.concat(pages, ignore_index=True) if len(pages) > 1 else pages[0]
+        
+        cursor = None
+        if len(page) == limit:
+            last = page.iloc[-1]
+            value = last[sort_by]
+            value = None if pd.isna(value) else value.item() if hasattr(value, 'item') else value
+            cursor = (value, int(last['id']))
+        return page[['id'] + [column for column in columns if column != 'id']], cursor
+
+    @staticmethod
+    def _page_segments(sort_by: str, descending: bool, after: Optional[Tuple[Any, int]]) -> List[Tuple[str, list]]:
+        """
+        Các đoạn của thứ tự phân trang còn lại sau con trỏ `after`, mỗi đoạn là (điều kiện, tham số)
+        
+        SQLite coi NULL nhỏ hơn mọi giá trị: theo thứ tự giảm dần các dòng có sort_by là NULL
+        đứng cuối, theo thứ tự tăng dần thì đứng đầu. So sánh bộ giá trị (sort_by, id) với NULL
+        cho kết quả NULL nên không dùng được cho các dòng này; thay vào đó, phần có giá trị và
+        phần NULL là hai đoạn truy vấn riêng (mỗi đoạn đều tìm được bằng chỉ mục), lấy lần lượt
+        cho đến khi đủ trang.
+        """
+        comparison = '<' if descending else '>'
+        values = (f'{sort_by} IS NOT NULL', [])
+        nulls = (f'{sort_by} IS NULL', [])
+        if after is None:
+            return [values, nulls] if descending else [nulls, values]
+        
+        value, last_id = after
+        if value is None:
+            rest_of_nulls = (f'{sort_by} IS NULL AND id {comparison} ?', [last_id])
+            return [rest_of_nulls] if descending else [rest_of_nulls, values]
+        # So sánh bộ giá trị (sort_by, id) để thứ tự chặt chẽ khi có giá trị trùng nhau
+        rest_of_values = (f'({sort_by}, id) {comparison} (?, ?)', [value, last_id])
+        return [rest_of_values, nulls] if descending else [rest_of_values]
+    
+    def count_results(
+        self,
+        H: Optional[float] = None,
+        min_K: Optional[float] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None
+    ) -> int:
+        """Số kết quả tính toán thỏa mãn các tiêu chí lọc (xem search_results)"""
+        where, params = self._filter_clause(H, min_K, ranges)
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM calculation_results WHERE {where}', params)
+        return cursor.fetchone()[0]
     
     def delete_result(self, result_id: int) -> bool:
         """
@@ -177,17 +812,31 @@ class DamDatabase:
         Returns:
             True nếu xóa thành công, False nếu không tìm thấy
         """
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM calculation_results WHERE id = ?', (result_id,))
-        self.conn.commit()
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute('DELETE FROM loss_histories WHERE result_id = ?', (result_id,))
+            cursor.execute('DELETE FROM calculation_results WHERE id = ?', (result_id,))
+            self.conn.commit()
+            
+            if self._index_ids is not None:
+                keep = self._index_ids != result_id
+                self._index_ids = self._index_ids[keep]
+                self._index_points = self._index_points[keep]
+                self._index_solutions = self._index_solutions[keep]
         
         return cursor.rowcount > 0
     
     def close(self):
-        """Đóng kết nối đến cơ sở dữ liệu"""
-        if self.conn:
-            self.conn.close()
+        """Đóng kết nối của tất cả các luồng đến cơ sở dữ liệu"""
+        with self._connections_lock:
+            # Làm rỗng tại chỗ: hàm hủy theo luồng (xem conn) nhận ra kết nối đã được đóng
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            _close_connection(conn)
+        self._local = threading.local()
     
     def __del__(self):
         """Đảm bảo đóng kết nối khi đối tượng bị hủy"""
-        self.close()
+        if hasattr(self, '_connections'):
+            self.close()
@@ -0,0 +1,217 @@
+"""
+Mô-đun xuất và nhập lịch sử tính toán dưới dạng dữ liệu cột (Parquet hoặc mảng NumPy)
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.database import RESULT_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ('parquet', 'npy')
+
+# Kiểu dữ liệu của các cột không phải số thực khi xuất ra mảng NumPy (chuỗi có độ dài cố định
+# để dùng được memmap); chuỗi rỗng thay cho giá trị NULL
+NPY_DTYPES = {
+    'id': np.int64,
+    'timestamp': 'U19',
+    'input_hash': 'U64'
+}
+STRING_COLUMNS = ('timestamp', 'input_hash')
+
+METADATA_FILE = 'metadata.json'
+
+def _npy_dtype(column: str) -> Any:
+    """Kiểu dữ liệu NumPy của một cột"""
+    return NPY_DTYPES.get(column, np.float64)
+
+def export_results(
+    db: Any,
+    path: str,
+    include_loss_history: bool = False,
+    chunk_size: int = 50000,
+    format: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Xuất bảng calculation_results ra dữ liệu cột, đọc theo từng nhóm để bộ nhớ bị chặn
+    
+    Dạng 'parquet' (cần pyarrow) ghi một tệp Parquet, mỗi nhóm là một row group, lịch sử mất mát
+    là cột list<float32>. Dạng 'npy' ghi một thư mục gồm mỗi cột một tệp .npy (mở lại được bằng
+    np.load(..., mmap_mode='r')), lịch sử mất mát được nối thành loss_values.npy kèm
+    loss_offsets.npy (lịch sử của dòng i là loss_values[offsets[i]:offsets[i + 1]]), và
+    metadata.json mô tả các cột.
+    
+    Args:
+        db: DamDatabase nguồn
+        path: Tệp .parquet hoặc thư mục đích
+        include_loss_history: Xuất kèm lịch sử mất mát
+        chunk_size: Số dòng đọc mỗi lần
+        format: 'parquet' hoặc 'npy' (nếu None, 'parquet' khi có pyarrow, ngược lại 'npy')
+    
+    Returns:
+        Dict gồm path, format, rows, loss_points và computation_time
+    """
+    if format is None:
+        format = 'parquet' if pq is not None else 'npy'
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Định dạng không hợp lệ: {format} (chọn một trong {EXPORT_FORMATS})")
+    if format == 'parquet' and pq is None:
+        raise ImportError("Cần cài đặt pyarrow để xuất Parquet (hoặc dùng format='npy')")
+    
+    start_time = time.time()
+    # Cố định tập dòng được xuất: các dòng ghi thêm trong lúc xuất không làm lệch kích thước mảng
+    max_id, rows, loss_points = db.conn.execute('''
+    SELECT COALESCE(MAX(r.id), 0), COUNT(*), COALESCE(SUM(h.n_points), 0)
+    FROM calculation_results r LEFT JOIN loss_histories h ON h.result_id = r.id
+    ''').fetchone()
+    chunks = db.iter_result_chunks(chunk_size, include_loss_history, max_id)
+    
+    if format == 'parquet':
+        rows, loss_points = _write_parquet(chunks, path, include_loss_history)
+    else:
+        rows, loss_points = _write_npy(chunks, path, rows, loss_points if include_loss_history else None)
+    
+    return {
+        'path': path,
+        'format': format,
+        'rows': rows,
+        'loss_points': loss_points,
+        'computation_time': time.time() - start_time
+    }
+
+def _write_parquet(chunks: Iterator[pd.DataFrame], path: str, include_loss_history: bool) -> tuple:
+    """Ghi các nhóm dòng vào một tệp Parquet"""
+    fields = [(column, pa.int64() if column == 'id' else pa.string() if column in STRING_COLUMNS else pa.float64())
+              for column in RESULT_COLUMNS]
+    if include_loss_history:
+        fields.append(('loss_history', pa.list_(pa.float32())))
+    schema = pa.schema(fields)
+    
+    rows = loss_points = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            arrays = [pa.array(chunk[column].to_numpy(), type=schema.field(column).type) for column in RESULT_COLUMNS]
+            if include_loss_history:
+                histories = chunk['loss_history']
+                offsets = np.concatenate([[0], np.cumsum([len(history) for history in histories])]).astype(np.int32)
+                values = np.concatenate(list(histories)) if len(histories) else np.empty(0, dtype=np.float32)
+                arrays.append(pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, type=pa.float32())))
+                loss_points += int(offsets[-1])
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows, loss_points
+
+def _write_npy(chunks: Iterator[pd.DataFrame], path: str, rows: int, loss_points: Optional[int]) -> tuple:
+    """Ghi các nhóm dòng vào thư mục các tệp .npy, điền dần qua memmap"""
+    os.makedirs(path, exist_ok=True)
+    arrays = {column: np.lib.format.open_memmap(os.path.join(path, f'{column}.npy'), mode='w+',
+                                                dtype=_npy_dtype(column), shape=(rows,))
+              for column in RESULT_COLUMNS}
+    if loss_points is not None:
+        values = np.lib.format.open_memmap(os.path.join(path, 'loss_values.npy'), mode='w+',
+                                           dtype=np.float32, shape=(loss_points,))
+        offsets = np.lib.format.open_memmap(os.path.join(path, 'loss_offsets.npy'), mode='w+',
+                                            dtype=np.int64, shape=(rows + 1,))
+        offsets[0] = 0
+    
+    row = point = 0
+    for chunk in chunks:
+        size = len(chunk)
+        for column, array in arrays.items():
+            data = chunk[column]
+            if column in STRING_COLUMNS:
+                data = data.fillna('')
+            array[row:row + size] = data.to_numpy()
+        if loss_points is not None:
+            lengths = np.array([len(history) for history in chunk['loss_history']], dtype=np.int64)
+            offsets[row + 1:row + size + 1] = point + np.cumsum(lengths)
+            if lengths.sum():
+                values[point:point + lengths.sum()] = np.concatenate(list(chunk['loss_history']))
+            point += int(lengths.sum())
+        row += size
+    
+    for array in arrays.values():
+        array.flush()
+    if loss_points is not None:
+        values.flush()
+        offsets.flush()
+    with open(os.path.join(path, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'rows': row, 'columns': list(RESULT_COLUMNS), 'loss_history': loss_points is not None}, f)
+    return row, point
+
+def iter_export(path: str, chunk_size: int = 50000) -> Iterator[pd.DataFrame]:
+    """
+    Đọc lại dữ liệu đã xuất theo từng nhóm dòng
+    
+    Args:
+        path: Tệp .parquet hoặc thư mục .npy tạo bởi export_results
+        chunk_size: Số dòng mỗi nhóm
+    
+    Yields:
+        DataFrame với các cột RESULT_COLUMNS (và loss_history là mảng float32 nếu đã xuất kèm)
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, METADATA_FILE), encoding='utf-8') as f:
+            metadata = json.load(f)
+        arrays = {column: np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')
+                  for column in metadata['columns']}
+        if metadata['loss_history']:
+            values = np.load(os.path.join(path, 'loss_values.npy'), mmap_mode='r')
+            offsets = np.load(os.path.join(path, 'loss_offsets.npy'), mmap_mode='r')
+        for start in range(0, metadata['rows'], chunk_size):
+            stop = min(start + chunk_size, metadata['rows'])
+            chunk = pd.DataFrame({column: np.asarray(array[start:stop]) for column, array in arrays.items()})
+            if metadata['loss_history']:
+                chunk['loss_history'] = [np.array(values[offsets[i]:offsets[i + 1]]) for i in range(start, stop)]
+            for column in STRING_COLUMNS:
+                chunk[column] = chunk[column].astype(object).where(chunk[column] != '', None)
+            yield chunk
+        return
+    
+    if pq is None:
+        raise ImportError("Cần cài đặt pyarrow để đọc tệp Parquet")
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        chunk = batch.to_pandas()
+        if 'loss_history' in chunk:
+            chunk['loss_history'] = [np.asarray(history, dtype=np.float32) for history in chunk['loss_history']]
+        yield chunk
+
+def import_results(db: Any, path: str, chunk_size: int = 50000) -> Dict[str, Any]:
+    """
+    Nhập dữ liệu đã xuất vào DamDatabase bằng save_results_many
+    
+    Các dòng nhận id mới nhưng giữ nguyên timestamp; dòng có input_hash đã tồn tại trong cơ sở
+    dữ liệu được bỏ qua, nên nhập lại cùng một tệp không tạo bản ghi trùng (trừ các dòng cũ
+    không có input_hash).
+    
+    Args:
+        db: DamDatabase đích
+        path: Tệp .parquet hoặc thư mục .npy tạo bởi export_results
+        chunk_size: Số dòng mỗi giao dịch
+    
+    Returns:
+        Dict gồm rows (số dòng đã đọc), inserted (số bản ghi mới) và computation_time
+    """
+    start_time = time.time()
+    before = db.count_results()
+    rows = 0
+    for chunk in iter_export(path, chunk_size):
+        chunk = chunk.drop(columns=['id'])
+        db.save_results_many(chunk, chunk_size=chunk_size)
+        rows += len(chunk)
+    return {
+        'rows': rows,
+        'inserted': db.count_results() - before,
+        'computation_time': time.time() - start_time
+    }
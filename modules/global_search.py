@@ -0,0 +1,255 @@
+"""
+Mô-đun tìm kiếm toàn cục mặt cắt đập tối ưu trên lưới (n, m, xi) có chứng nhận sai số
+"""
+
+import numpy as np
+import time
+from typing import Any, Dict, Tuple
+
+from modules.numpy_engine import N_RANGE, M_RANGE, XI_RANGE, compute_physics_np
+
+class _Interval:
+    """
+    Số học khoảng trên mảng numpy, dùng để chặn giá trị của compute_physics_np trên cả một ô lưới
+    
+    Chỉ cài đặt các phép toán mà compute_physics_np sử dụng (+, -, *, /, **2); kết quả luôn bao
+    trọn mọi giá trị có thể của biểu thức khi các biến chạy trong khoảng.
+    """
+    # Để numpy gọi các phép toán phản chiếu (__rmul__, ...) thay vì tự broadcast
+    __array_ufunc__ = None
+
+    def __init__(self, lo: Any, hi: Any):
+        self.lo = lo
+        self.hi = hi
+
+    def __add__(self, other):
+        if isinstance(other, _Interval):
+            return _Interval(self.lo + other.lo, self.hi + other.hi)
+        return _Interval(self.lo + other, self.hi + other)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return _Interval(-self.hi, -self.lo)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __mul__(self, other):
+        if isinstance(other, _Interval):
+            products = (self.lo * other.lo, self.lo * other.hi, self.hi * other.lo, self.hi * other.hi)
+            return _Interval(np.minimum.reduce(products), np.maximum.reduce(products))
+        a, b = self.lo * other, self.hi * other
+        return _Interval(np.minimum(a, b), np.maximum(a, b))
+
+    __rmul__ = __mul__
+
+    def _reciprocal(self):
+        if np.any((self.lo <= 0) & (self.hi >= 0)):
+            raise ZeroDivisionError("Khoảng mẫu số chứa giá trị 0")
+        return _Interval(1 / self.hi, 1 / self.lo)
+
+    def __truediv__(self, other):
+        if isinstance(other, _Interval):
+            return self * other._reciprocal()
+        return self * (1 / other)
+
+    def __rtruediv__(self, other):
+        return self._reciprocal() * other
+
+    def __pow__(self, exponent):
+        if exponent != 2:
+            raise NotImplementedError("Chỉ hỗ trợ lũy thừa bậc 2")
+        lo2, hi2 = self.lo**2, self.hi**2
+        contains_zero = (self.lo <= 0) & (self.hi >= 0)
+        return _Interval(np.where(contains_zero, 0.0, np.minimum(lo2, hi2)), np.maximum(lo2, hi2))
+
+def _evaluate_cells(lo: np.ndarray, hi: np.ndarray, params: Tuple[float, ...],
+                    K_min: float, sigma_tol: float) -> Dict[str, np.ndarray]:
+    """
+    Đánh giá một lô ô lưới: giá trị tại tâm ô và cận của (sigma, K, A) trên toàn ô
+    
+    Args:
+        lo, hi: Biên dưới/trên của các ô, kích thước (3, số ô) theo thứ tự (n, m, xi)
+        params: (H, gamma_bt, gamma_n, f, C, a1)
+        K_min: Hệ số ổn định tối thiểu Kc·k_factor
+        sigma_tol: Sai số cho điều kiện σ ≤ 0
+    """
+    center = 0.5 * (lo + hi)
+    sigma, K, A = compute_physics_np(center[0], center[2], center[1], *params)
+    
+    bounds = compute_physics_np(_Interval(lo[0], hi[0]), _Interval(lo[2], hi[2]),
+                                _Interval(lo[1], hi[1]), *params)
+    sigma_bound, K_bound, A_bound = bounds
+    
+    return {
+        'center': center,
+        'sigma': sigma,
+        'K': K,
+        'A': A,
+        'feasible': (K >= K_min) & (sigma <= sigma_tol),
+        # Ô có thể chứa điểm khả thi nếu cận trên của K và cận dưới của σ cho phép
+        'possible': (K_bound.hi >= K_min) & (sigma_bound.lo <= sigma_tol),
+        'A_lower': A_bound.lo
+    }
+
+def global_search(
+    H: float,
+    gamma_bt: float = 2.4,
+    gamma_n: float = 1.0,
+    f: float = 0.7,
+    C: float = 0.5,
+    Kc: float = 1.2,
+    a1: float = 0.6,
+    k_factor: float = 1.0,
+    grid: Tuple[int, int, int] = (40, 70, 99),
+    refine: int = 2,
+    levels: int = 8,
+    sigma_tol: float = 0.0,
+    gap_tol: float = 1e-4,
+    chunk_size: int = 100000,
+    max_cells: int = 200000,
+    verbose: bool = False
+) -> Dict:
+    """
+    Tìm mặt cắt khả thi có diện tích nhỏ nhất bằng tìm kiếm lưới toàn cục có chứng nhận
+    
+    Miền (n, m, xi) ∈ [0, 0.4] × [0.5, 4] × [0.01, 1] được chia thành các ô. Với mỗi ô, giá trị
+    tại tâm cho một nghiệm khả thi (cận trên của diện tích tối ưu), còn số học khoảng cho cận
+    dưới của A và cho biết ô có thể chứa điểm khả thi hay không. Các ô không thể khả thi hoặc có
+    cận dưới lớn hơn nghiệm tốt nhất bị loại; các ô còn lại được chia nhỏ `refine` lần theo mỗi
+    chiều ở cấp tiếp theo. Mọi bước đều xử lý theo lô `chunk_size` ô và giữ tối đa `max_cells`
+    ô ứng viên nên bộ nhớ bị chặn, không phụ thuộc vào H.
+    
+    Args:
+        H, gamma_bt, gamma_n, f, C, Kc, a1: Thông số đầu vào như optimize_dam_section
+        k_factor: Hệ số nhân cho Kc
+        grid: Số ô ban đầu theo (n, m, xi)
+        refine: Hệ số chia nhỏ mỗi chiều khi tinh chỉnh
+        levels: Số cấp tinh chỉnh tối đa
+        sigma_tol: Sai số cho điều kiện σ ≤ 0 (T/m²)
+        gap_tol: Dừng khi sai số tối ưu tương đối nhỏ hơn ngưỡng này
+        chunk_size: Số ô được đánh giá trong một lô
+        max_cells: Số ô ứng viên tối đa được giữ lại giữa các cấp
+        verbose: Hiển thị thông tin trong quá trình tìm kiếm
+    
+    Returns:
+        Dict: Kết quả cùng cấu trúc với optimize_dam_section, kèm cận dưới (lower_bound),
+        sai số tối ưu tuyệt đối/tương đối (optimality_gap, relative_gap) và số ô đã đánh giá
+    """
+    start_time = time.time()
+    
+    params = (H, gamma_bt, gamma_n, f, C, a1)
+    K_min = Kc * k_factor
+    lows = np.array([N_RANGE[0], M_RANGE[0], XI_RANGE[0]])
+    spans = np.array([N_RANGE[1] - N_RANGE[0], M_RANGE[1] - M_RANGE[0], XI_RANGE[1] - XI_RANGE[0]])
+    
+    best = {'A': np.inf}
+    evaluations = 0
+    # Cận dưới của các ô ứng viên bị bỏ do vượt quá max_cells
+    dropped_bound = np.inf
+
+    def absorb(cells: Dict[str, np.ndarray]) -> None:
+        nonlocal best
+        feasible = np.flatnonzero(cells['feasible'])
+        if len(feasible) == 0:
+            return
+        i = feasible[np.argmin(cells['A'][feasible])]
+        if cells['A'][i] < best['A']:
+            best = {
+                'n': float(cells['center'][0, i]),
+                'm': float(cells['center'][1, i]),
+                'xi': float(cells['center'][2, i]),
+                'A': float(cells['A'][i]),
+                'K': float(cells['K'][i]),
+                'sigma': float(cells['sigma'][i])
+            }
+
+    def keep(candidates: list, lo: np.ndarray, hi: np.ndarray, cells: Dict[str, np.ndarray]) -> None:
+        mask = cells['possible'] & (cells['A_lower'] < best['A'])
+        if mask.any():
+            candidates.append((lo[:, mask], hi[:, mask], cells['A_lower'][mask]))
+
+    def prune(candidates: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        nonlocal dropped_bound
+        if not candidates:
+            return np.empty((3, 0)), np.empty((3, 0)), np.empty(0)
+        lo = np.concatenate([c[0] for c in candidates], axis=1)
+        hi = np.concatenate([c[1] for c in candidates], axis=1)
+        A_lower = np.concatenate([c[2] for c in candidates])
+        mask = A_lower < best['A']
+        lo, hi, A_lower = lo[:, mask], hi[:, mask], A_lower[mask]
+        if len(A_lower) > max_cells:
+            order = np.argsort(A_lower)
+            dropped_bound = min(dropped_bound, float(A_lower[order[max_cells]]))
+            order = order[:max_cells]
+            lo, hi, A_lower = lo[:, order], hi[:, order], A_lower[order]
+        return lo, hi, A_lower
+    
+    # Cấp 0: lưới đều trên toàn miền
+    shape = tuple(int(g) for g in grid)
+    widths = spans / np.array(shape)
+    total = int(np.prod(shape))
+    candidates = []
+    for begin in range(0, total, chunk_size):
+        index = np.arange(begin, min(begin + chunk_size, total))
+        lo = lows[:, None] + np.stack(np.unravel_index(index, shape)) * widths[:, None]
+        hi = lo + widths[:, None]
+        cells = _evaluate_cells(lo, hi, params, K_min, sigma_tol)
+        evaluations += len(index)
+        absorb(cells)
+        keep(candidates, lo, hi, cells)
+    lo, hi, A_lower = prune(candidates)
+    
+    # Các cấp tinh chỉnh: chia nhỏ các ô ứng viên còn lại
+    offsets = np.stack(np.unravel_index(np.arange(refine**3), (refine,) * 3)).astype(float)
+    level = 0
+    while level < levels and len(A_lower) > 0:
+        lower_bound = min(float(A_lower.min()), dropped_bound, best['A'])
+        if np.isfinite(best['A']) and best['A'] - lower_bound <= gap_tol * best['A']:
+            break
+        if verbose:
+            print(f"Cấp {level}: {len(A_lower)} ô ứng viên, A tốt nhất = {best['A']:.4f}, cận dưới = {lower_bound:.4f}")
+        
+        parents_per_chunk = max(chunk_size // refine**3, 1)
+        candidates = []
+        for begin in range(0, len(A_lower), parents_per_chunk):
+            parent_lo = lo[:, begin:begin + parents_per_chunk]
+            parent_hi = hi[:, begin:begin + parents_per_chunk]
+            child_width = (parent_hi - parent_lo) / refine
+            child_lo = (parent_lo[:, :, None] + offsets[:, None, :] * child_width[:, :, None]).reshape(3, -1)
+            child_hi = child_lo + np.repeat(child_width, refine**3, axis=1)
+            cells = _evaluate_cells(child_lo, child_hi, params, K_min, sigma_tol)
+            evaluations += child_lo.shape[1]
+            absorb(cells)
+            keep(candidates, child_lo, child_hi, cells)
+        lo, hi, A_lower = prune(candidates)
+        level += 1
+    
+    if not np.isfinite(best['A']):
+        raise ValueError("Không tìm thấy mặt cắt khả thi trong miền tìm kiếm")
+    
+    lower_bound = min(float(A_lower.min()) if len(A_lower) else np.inf, dropped_bound, best['A'])
+    gap = best['A'] - lower_bound
+    elapsed_time = time.time() - start_time
+    
+    best.update({
+        'loss_history': [],
+        'computation_time': elapsed_time,
+        'lower_bound': lower_bound,
+        'optimality_gap': gap,
+        'relative_gap': gap / best['A'],
+        'evaluations': evaluations,
+        'levels': level,
+        'H': H,
+        'gamma_bt': gamma_bt,
+        'gamma_n': gamma_n,
+        'f': f,
+        'C': C,
+        'Kc': Kc,
+        'a1': a1
+    })
+    return best
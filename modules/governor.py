@@ -0,0 +1,192 @@
+"""
+Mô-đun điều phối tài nguyên tính toán dùng chung cho các phiên làm việc của ứng dụng
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from modules.numpy_engine import OptimizationCancelled
+
+class ComputeGovernor:
+    """
+    Giới hạn số phép tối ưu chạy đồng thời trong một tiến trình và xếp hàng các yêu cầu còn lại
+    
+    Các yêu cầu được phục vụ theo thứ tự đến (FIFO): một yêu cầu chỉ được chạy khi đứng đầu hàng
+    đợi và còn chỗ trống. Số luồng của PyTorch là thiết lập chung của cả tiến trình, nên ngân sách
+    luồng được áp dụng một lần cho tất cả: mỗi phép tối ưu dùng tối đa
+    threads_per_job = số lõi // max_concurrent luồng, tổng số luồng không vượt quá số lõi.
+    """
+    def __init__(self, max_concurrent: Optional[int] = None, threads_per_job: Optional[int] = None):
+        """
+        Args:
+            max_concurrent: Số phép tối ưu chạy đồng thời tối đa (nếu None, một nửa số lõi, tối thiểu 1)
+            threads_per_job: Số luồng PyTorch cho mỗi phép tối ưu (nếu None, chia đều số lõi)
+        """
+        cores = os.cpu_count() or 1
+        self.max_concurrent = max_concurrent or max(cores // 2, 1)
+        self.threads_per_job = threads_per_job or max(cores // self.max_concurrent, 1)
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._running = 0
+        self._tickets = itertools.count()
+        self._started = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._threads_applied = False
+
+    def _apply_thread_budget(self) -> None:
+        """Đặt số luồng PyTorch của tiến trình theo ngân sách (chỉ thực hiện một lần)"""
+        if self._threads_applied:
+            return
+        import torch
+        torch.set_num_threads(self.threads_per_job)
+        self._threads_applied = True
+
+    def queue_position(self, ticket: int) -> int:
+        """Vị trí (bắt đầu từ 1) của một yêu cầu trong hàng đợi, 0 nếu đang chạy hoặc đã xong"""
+        with self._condition:
+            try:
+                return self._queue.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def issue_ticket(self) -> int:
+        """
+        Lấy chỗ trong hàng đợi mà chưa chờ (ví dụ khi tác vụ vừa được gửi, trước khi có luồng chạy nó)
+        
+        Returns:
+            Mã yêu cầu, dùng cho acquire (hoặc cancel_ticket nếu bỏ yêu cầu)
+        """
+        with self._condition:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            return ticket
+
+    def cancel_ticket(self, ticket: int) -> bool:
+        """
+        Bỏ một yêu cầu chưa được chạy khỏi hàng đợi; các yêu cầu phía sau tiến lên ngay
+        
+        Returns:
+            True nếu yêu cầu còn trong hàng đợi
+        """
+        with self._condition:
+            try:
+                self._queue.remove(ticket)
+            except ValueError:
+                return False
+            # Đánh thức luồng đang chờ với mã này (nếu có) và các yêu cầu phía sau
+            self._condition.notify_all()
+            return True
+
+    def acquire(
+        self,
+        on_wait: Optional[Callable[[int], None]] = None,
+        poll_interval: float = 0.5,
+        should_stop: Optional[Callable[[], bool]] = None,
+        ticket: Optional[int] = None
+    ) -> int:
+        """
+        Chờ đến lượt chạy một phép tối ưu
+        
+        Args:
+            on_wait: Hàm được gọi với vị trí hiện tại trong hàng đợi mỗi khi vị trí thay đổi
+            poll_interval: Chu kỳ kiểm tra lại khi đang chờ (giây)
+            should_stop: Hàm được kiểm tra mỗi chu kỳ; trả về True để bỏ chờ
+            ticket: Mã lấy trước bằng issue_ticket (nếu None, xếp vào cuối hàng đợi)
+        
+        Returns:
+            Mã yêu cầu, dùng cho release
+        
+        Raises:
+            OptimizationCancelled: Nếu should_stop trả về True hoặc mã đã bị cancel_ticket bỏ;
+                yêu cầu không còn trong hàng đợi
+        """
+        start_time = time.time()
+        with self._condition:
+            if ticket is None:
+                ticket = next(self._tickets)
+                self._queue.append(ticket)
+            position = None
+            while True:
+                if ticket not in self._queue:
+                    raise OptimizationCancelled("Yêu cầu đã bị hủy khi đang chờ")
+                if should_stop is not None and should_stop():
+                    self._queue.remove(ticket)
+                    self._condition.notify_all()
+                    raise OptimizationCancelled("Yêu cầu đã bị hủy khi đang chờ")
+                if self._queue[0] == ticket and self._running < self.max_concurrent:
+                    break
+                current = self._queue.index(ticket) + 1
+                if on_wait is not None and current != position:
+                    # Gọi ngoài khóa để giao diện không chặn các luồng khác
+                    self._condition.release()
+                    try:
+                        on_wait(current)
+                    finally:
+                        self._condition.acquire()
+                    position = current
+                    continue
+                self._condition.wait(poll_interval)
+            self._queue.popleft()
+            self._running += 1
+            self._started += 1
+            self._total_wait += time.time() - start_time
+            self._apply_thread_budget()
+            # Yêu cầu kế tiếp có thể cũng được chạy nếu còn chỗ trống
+            self._condition.notify_all()
+        return ticket
+
+    def release(self, ticket: int) -> None:
+        """Kết thúc một phép tối ưu và nhường chỗ cho yêu cầu tiếp theo"""
+        with self._condition:
+            self._running -= 1
+            self._completed += 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(
+        self,
+        on_wait: Optional[Callable[[int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        ticket: Optional[int] = None
+    ) -> Iterator[int]:
+        """
+        Ngữ cảnh chạy một phép tối ưu dưới sự điều phối của bộ điều phối (tham số như acquire)
+        
+        Ví dụ:
+            with get_governor().slot(on_wait=lambda position: print(position)):
+                result = optimize_dam_section(H=60)
+        """
+        ticket = self.acquire(on_wait, should_stop=should_stop, ticket=ticket)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict[str, float]:
+        """Thống kê hiện tại: số phép đang chạy, đang chờ, đã xong và thời gian chờ trung bình"""
+        with self._condition:
+            return {
+                'running': self._running,
+                'waiting': len(self._queue),
+                'completed': self._completed,
+                'max_concurrent': self.max_concurrent,
+                'threads_per_job': self.threads_per_job,
+                'mean_wait': self._total_wait / self._started if self._started else 0.0
+            }
+
+_governor = None
+_governor_lock = threading.Lock()
+
+def get_governor() -> ComputeGovernor:
+    """Bộ điều phối dùng chung của tiến trình (khởi tạo ở lần gọi đầu tiên)"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = ComputeGovernor()
+        return _governor
@@ -0,0 +1,226 @@
+"""
+Mô-đun chạy các phép tối ưu dưới dạng tác vụ nền, tách khỏi luồng giao diện Streamlit
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from modules.cache import ResultCache, input_hash
+from modules.database import DamDatabase
+from modules.governor import ComputeGovernor, get_governor
+from modules.pinns_model import OptimizationCancelled
+
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+class _Job:
+    """Trạng thái của một tác vụ"""
+    def __init__(self, job_id: str, params: Dict[str, Any], key: Optional[str] = None):
+        self.id = job_id
+        self.params = params
+        self.key = key
+        # Số phiên đang theo dõi tác vụ; tác vụ chỉ bị hủy khi không còn phiên nào
+        self.subscribers = 1
+        self.state = 'queued'
+        # Chỗ trong hàng đợi của bộ điều phối, lấy ngay khi gửi tác vụ
+        self.ticket = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        # Báo cáo tiến trình gần nhất và các điểm (epoch, loss) đã nhận
+        self.progress = None
+        self.loss_trace = []
+
+class JobManager:
+    """
+    Quản lý các tác vụ tối ưu chạy nền trên một nhóm luồng
+    
+    Mỗi tác vụ chờ đến lượt ở bộ điều phối tài nguyên (ComputeGovernor), tính toán qua bộ nhớ
+    đệm kết quả và ghi kết quả vào cơ sở dữ liệu dùng chung (DamDatabase, mỗi luồng một kết nối).
+    Tác vụ được định danh bằng chuỗi ngẫu nhiên nên giao diện có thể gắn lại sau khi tải lại trang.
+    Yêu cầu trùng bộ thông số với một tác vụ chưa kết thúc được gắn vào tác vụ đó. Chỗ trong hàng
+    đợi của bộ điều phối được lấy ngay khi gửi, nên vị trí chờ đúng cả khi tác vụ chưa có luồng
+    nền nào nhận.
+    """
+    def __init__(
+        self,
+        db_path: str = "data/dam_results.db",
+        cache: Optional[ResultCache] = None,
+        governor: Optional[ComputeGovernor] = None,
+        max_workers: int = 8,
+        max_finished: int = 100,
+        progress_every: int = 100
+    ):
+        """
+        Args:
+            db_path: Đường dẫn cơ sở dữ liệu nơi các tác vụ ghi kết quả (không dùng nếu cache đã
+                gắn với một DamDatabase; khi đó các tác vụ ghi vào cơ sở dữ liệu của cache)
+            cache: Bộ nhớ đệm kết quả dùng chung (nếu None, tạo bộ nhớ đệm mới)
+            governor: Bộ điều phối tài nguyên (nếu None, dùng bộ điều phối chung của tiến trình)
+            max_workers: Số luồng nền; số phép tính thực sự chạy đồng thời do governor quyết định
+            max_finished: Số tác vụ đã kết thúc được giữ lại để tra cứu
+            progress_every: Chu kỳ (vòng lặp) cập nhật tiến trình của tác vụ đang chạy
+        """
+        self.cache = cache if cache is not None else ResultCache()
+        self.db = self.cache.db if self.cache.db is not None else DamDatabase(db_path)
+        self.db_path = self.db.db_path
+        self.governor = governor if governor is not None else get_governor()
+        self.max_finished = max_finished
+        self.progress_every = progress_every
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dam-job')
+        self._jobs = {}
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def submit(self, **params: Any) -> str:
+        """
+        Đưa một phép tối ưu vào hàng đợi
+        
+        Args:
+            params: Các tham số của optimize_dam_section
+        
+        Returns:
+            Mã tác vụ (của tác vụ đang chạy nếu đã có yêu cầu giống hệt)
+        """
+        try:
+            key = input_hash(**params)
+        except TypeError:
+            # Tham số không hợp lệ: để tác vụ báo lỗi khi chạy
+            key = None
+        
+        with self._lock:
+            existing = self._jobs.get(self._active.get(key))
+            if existing is not None and existing.finished_at is None and not existing.cancel_event.is_set():
+                existing.subscribers += 1
+                return existing.id
+            job = _Job(uuid.uuid4().hex, params, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active[key] = job.id
+            self._prune()
+            # Lấy chỗ và đưa vào nhóm luồng trong cùng khóa: thứ tự nhận việc của nhóm luồng trùng
+            # thứ tự hàng đợi, nên luồng nền không bao giờ chờ sau một tác vụ chưa có luồng nhận
+            job.ticket = self.governor.issue_ticket()
+            self._executor.submit(self._run, job)
+        return job.id
+
+    def _prune(self) -> None:
+        """Bỏ các tác vụ đã kết thúc cũ nhất khi vượt quá max_finished"""
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job.id]
+
+    def _run(self, job: _Job) -> None:
+        """Thực hiện một tác vụ trong luồng nền"""
+        def on_progress(report):
+            job.loss_trace.append((report['epoch'], report['loss']))
+            job.progress = report
+        
+        if job.finished_at is not None:
+            # Đã bị hủy khi còn trong hàng đợi (xem cancel)
+            return
+        try:
+            with self.governor.slot(should_stop=job.cancel_event.is_set, ticket=job.ticket):
+                with self._lock:
+                    if job.cancel_event.is_set():
+                        raise OptimizationCancelled("Tác vụ bị hủy trước khi chạy")
+                    job.state = 'running'
+                    job.started_at = time.time()
+                job.result = self.cache.optimize(db=self.db, should_stop=job.cancel_event.is_set,
+                                                 progress=on_progress, progress_every=self.progress_every,
+                                                 **job.params)
+            job.state = 'done'
+        except OptimizationCancelled:
+            job.state = 'cancelled'
+        except Exception as exc:
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.state = 'failed'
+        finally:
+            with self._lock:
+                self._finish(job)
+
+    def _finish(self, job: _Job) -> None:
+        """Đánh dấu tác vụ đã kết thúc (gọi khi đã giữ khóa)"""
+        if job.finished_at is None:
+            job.finished_at = time.time()
+        if self._active.get(job.key) == job.id:
+            del self._active[job.key]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Trạng thái hiện tại của một tác vụ
+        
+        Returns:
+            Dict gồm state (xem JOB_STATES), queue_position (từ 1 khi đang chờ, 0 khi không chờ),
+            elapsed (giây), error, báo cáo
+            tiến trình gần nhất (progress, xem optimize_dam_section) và các điểm (epoch, loss)
+            đã nhận (loss_trace), hoặc None nếu không có tác vụ
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        start = job.started_at or job.submitted_at
+        end = job.finished_at or time.time()
+        queue_position = 0
+        if job.state == 'queued':
+            # Mã đã rời hàng đợi nhưng tác vụ chưa kịp chuyển sang 'running': đang ở đầu hàng
+            queue_position = max(self.governor.queue_position(job.ticket), 1)
+        return {
+            'id': job.id,
+            'state': job.state,
+            'queue_position': queue_position,
+            'elapsed': end - start,
+            'error': job.error,
+            'progress': job.progress,
+            'loss_trace': list(job.loss_trace)
+        }
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Kết quả của tác vụ đã hoàn thành, None nếu chưa xong hoặc không thành công"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.state != 'done':
+            return None
+        return job.result
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Yêu cầu hủy một tác vụ đang chờ hoặc đang chạy
+        
+        Tác vụ được nhiều phiên dùng chung chỉ thực sự bị hủy khi tất cả các phiên đều hủy. Tác vụ
+        đang chờ được bỏ khỏi hàng đợi ngay, các tác vụ phía sau tiến lên.
+        
+        Returns:
+            True nếu tác vụ tồn tại và chưa kết thúc
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished_at is not None:
+                return False
+            job.subscribers -= 1
+            if job.subscribers <= 0:
+                self._cancel(job)
+        return True
+
+    def _cancel(self, job: _Job) -> None:
+        """Hủy một tác vụ (gọi khi đã giữ khóa)"""
+        job.cancel_event.set()
+        if job.state == 'queued':
+            self.governor.cancel_ticket(job.ticket)
+            job.state = 'cancelled'
+            self._finish(job)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Hủy các tác vụ chưa kết thúc và dừng nhóm luồng"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.finished_at is None:
+                    self._cancel(job)
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,347 @@
+"""
+Mô-đun tối ưu mặt cắt đập bê tông bằng NumPy với gradient giải tích (không cần PyTorch)
+"""
+
+import numpy as np
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Giá trị mặc định của các thông số đầu vào (trùng với optimize_dam_section)
+DEFAULT_INPUTS = {
+    'gamma_bt': 2.4,
+    'gamma_n': 1.0,
+    'f': 0.7,
+    'C': 0.5,
+    'Kc': 1.2,
+    'a1': 0.6
+}
+
+INPUT_NAMES = ('H', 'gamma_bt', 'gamma_n', 'f', 'C', 'Kc', 'a1')
+
+# Miền giá trị của các thông số đầu vào (trùng với form nhập liệu trong app.py)
+INPUT_BOUNDS = {
+    'H': (10.0, 300.0),
+    'gamma_bt': (2.0, 3.0),
+    'gamma_n': (0.9, 1.1),
+    'f': (0.3, 0.9),
+    'C': (0.0, 10.0),
+    'Kc': (1.0, 2.0),
+    'a1': (0.0, 1.0)
+}
+
+# Miền giá trị của các biến thiết kế
+N_RANGE = (0.0, 0.4)
+M_RANGE = (0.5, 4.0)
+XI_RANGE = (0.01, 1.0)
+
+STOP_REASONS = ('max_epochs', 'loss_plateau', 'param_drift', 'no_progress')
+
+BIG_PENALTY = 1e5
+
+class OptimizationCancelled(Exception):
+    """Ngoại lệ khi một phép tối ưu bị hủy giữa chừng (xem tham số should_stop)"""
+    pass
+
+def scenario_columns(scenarios: Any) -> Dict[str, np.ndarray]:
+    """
+    Chuẩn hóa danh sách kịch bản (DataFrame, dict các mảng hoặc list các dict) thành các cột numpy
+    
+    Args:
+        scenarios: Danh sách kịch bản với các cột H, gamma_bt, gamma_n, f, C, Kc, a1
+            (các cột thiếu dùng giá trị mặc định)
+    
+    Returns:
+        Dict ánh xạ tên thông số sang mảng numpy cùng độ dài
+    """
+    if hasattr(scenarios, 'to_dict') and hasattr(scenarios, 'columns'):
+        # pandas.DataFrame
+        scenarios = scenarios.to_dict('list')
+    elif isinstance(scenarios, (list, tuple)):
+        rows = list(scenarios)
+        if not rows:
+            raise ValueError("Danh sách kịch bản rỗng")
+        scenarios = {name: [row.get(name, DEFAULT_INPUTS.get(name)) for row in rows]
+                     for name in INPUT_NAMES}
+    
+    if 'H' not in scenarios:
+        raise ValueError("Thiếu chiều cao đập 'H' trong danh sách kịch bản")
+    
+    size = int(np.size(scenarios['H']))
+    if size == 0:
+        raise ValueError("Danh sách kịch bản rỗng")
+    
+    columns = {}
+    for name in INPUT_NAMES:
+        values = scenarios.get(name, DEFAULT_INPUTS.get(name))
+        if values is None:
+            raise ValueError(f"Thiếu thông số '{name}' trong danh sách kịch bản")
+        columns[name] = np.broadcast_to(np.asarray(values, dtype=np.float64), (size,)).copy()
+    return columns
+
+def compute_physics_np(n: Any, xi: Any, m: Any, H: Any, gamma_bt: Any, gamma_n: Any,
+                       f: Any, C: Any, a1: Any) -> Tuple[Any, Any, Any]:
+    """
+    Phiên bản NumPy của compute_physics (cùng công thức, hỗ trợ broadcast giữa các mảng)
+    
+    Returns:
+        Tuple chứa ứng suất mép thượng lưu (sigma), hệ số ổn định (K), diện tích mặt cắt (A)
+    """
+    B = H * (m + n * (1 - xi))
+    G1 = 0.5 * gamma_bt * m * H**2
+    G2 = 0.5 * gamma_bt * n * H**2 * (1 - xi)**2
+    G = G1 + G2
+    W1 = 0.5 * gamma_n * H**2
+    W2_1 = gamma_n * n * (1 - xi) * xi * H**2
+    W2_2 = 0.5 * gamma_n * n * H**2 * (1 - xi)**2
+    W2 = W2_1 + W2_2
+    Wt = 0.5 * gamma_n * a1 * H * (m * H + n * H * (1 - xi))
+    P = G + W2 - Wt
+    lG1 = H * (m / 6 - n * (1 - xi) / 2)
+    lG2 = H * (m / 2 - n * (1 - xi) / 6)
+    lt  = H * (m + n * (1 - xi)) / 6
+    l2  = H * m / 2
+    l22 = H * m / 2 + H * n * (1 - xi) / 6
+    l1  = H / 3
+    M0 = -G1 * lG1 - G2 * lG2 + Wt * lt - W2_1 * l2 - W2_2 * l22 + W1 * l1
+    sigma = P / B - 6 * M0 / B**2
+    Fct = f * (G + W2 - Wt) + C * H * (m + n * (1 - xi))
+    Fgt = 0.5 * gamma_n * H**2
+    K = Fct / Fgt
+    A = 0.5 * H**2 * (m + n * (1 - xi)**2)
+    return sigma, K, A
+
+def physics_gradients(n: np.ndarray, xi: np.ndarray, m: np.ndarray, H: np.ndarray,
+                      gamma_bt: np.ndarray, gamma_n: np.ndarray, f: np.ndarray,
+                      C: np.ndarray, a1: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Tính (sigma, K, A) cùng đạo hàm giải tích theo (n, m, xi)
+    
+    Mỗi đại lượng trung gian của compute_physics được tính kèm vector đạo hàm
+    (∂/∂n, ∂/∂m, ∂/∂xi) có kích thước (3, ...), rồi ghép lại theo quy tắc tích và thương.
+    
+    Returns:
+        Dict gồm sigma, K, A và các gradient d_sigma, d_K, d_A (kích thước (3, ...))
+    """
+    zero = np.zeros_like(n * m * xi * H)
+    one = zero + 1
+    
+    s = 1 - xi
+    p = n * s
+    H2 = H**2
+    # d(m + p) = (s, 1, -n)
+    mp = m + p
+    d_mp = np.stack([s + zero, one, -n + zero])
+    
+    B = H * mp
+    d_B = H * d_mp
+    
+    G1 = 0.5 * gamma_bt * m * H2
+    d_G1 = np.stack([zero, 0.5 * gamma_bt * H2 + zero, zero])
+    G2 = 0.5 * gamma_bt * n * H2 * s**2
+    d_G2 = np.stack([0.5 * gamma_bt * H2 * s**2 + zero, zero, -gamma_bt * H2 * n * s + zero])
+    W1 = 0.5 * gamma_n * H2
+    W2_1 = gamma_n * n * s * xi * H2
+    d_W2_1 = np.stack([gamma_n * H2 * s * xi + zero, zero, gamma_n * H2 * n * (1 - 2 * xi) + zero])
+    W2_2 = 0.5 * gamma_n * n * H2 * s**2
+    d_W2_2 = np.stack([0.5 * gamma_n * H2 * s**2 + zero, zero, -gamma_n * H2 * n * s + zero])
+    Wt = 0.5 * gamma_n * a1 * H2 * mp
+    d_Wt = 0.5 * gamma_n * a1 * H2 * d_mp
+    
+    P = G1 + G2 + W2_1 + W2_2 - Wt
+    d_P = d_G1 + d_G2 + d_W2_1 + d_W2_2 - d_Wt
+    
+    lG1 = H * (m / 6 - p / 2)
+    d_lG1 = np.stack([-H * s / 2 + zero, H / 6 + zero, H * n / 2 + zero])
+    lG2 = H * (m / 2 - p / 6)
+    d_lG2 = np.stack([-H * s / 6 + zero, H / 2 + zero, H * n / 6 + zero])
+    lt = H * mp / 6
+    d_lt = H * d_mp / 6
+    l2 = H * m / 2
+    d_l2 = np.stack([zero, H / 2 + zero, zero])
+    l22 = H * m / 2 + H * p / 6
+    d_l22 = np.stack([H * s / 6 + zero, H / 2 + zero, -H * n / 6 + zero])
+    l1 = H / 3
+    
+    M0 = -G1 * lG1 - G2 * lG2 + Wt * lt - W2_1 * l2 - W2_2 * l22 + W1 * l1
+    d_M0 = (-(d_G1 * lG1 + G1 * d_lG1) - (d_G2 * lG2 + G2 * d_lG2) + (d_Wt * lt + Wt * d_lt)
+            - (d_W2_1 * l2 + W2_1 * d_l2) - (d_W2_2 * l22 + W2_2 * d_l22))
+    
+    sigma = P / B - 6 * M0 / B**2
+    d_sigma = d_P / B - P * d_B / B**2 - 6 * d_M0 / B**2 + 12 * M0 * d_B / B**3
+    
+    K = (f * P + C * H * mp) / W1
+    d_K = (f * d_P + C * H * d_mp) / W1
+    
+    A = 0.5 * H2 * (m + n * s**2)
+    d_A = 0.5 * H2 * np.stack([s**2 + zero, one, -2 * n * s + zero])
+    
+    return {'sigma': sigma, 'K': K, 'A': A, 'd_sigma': d_sigma, 'd_K': d_K, 'd_A': d_A}
+
+def loss_np(sigma: np.ndarray, K: np.ndarray, A: np.ndarray, Kc: Any,
+            factor: Any = 1.0, alpha: Any = 0.01) -> np.ndarray:
+    """
+    Phiên bản NumPy của loss_function, trả về mất mát của từng kịch bản
+    """
+    penalty_K = BIG_PENALTY * np.maximum(Kc * factor - K, 0)**2
+    return penalty_K + 100 * sigma**2 + alpha * A
+
+def _evaluate(x: np.ndarray, lows: np.ndarray, spans: np.ndarray, columns: Dict[str, np.ndarray],
+              K_min: np.ndarray, alpha: Any) -> Dict[str, np.ndarray]:
+    """
+    Tính mất mát, gradient và Jacobian của các phần dư tại điểm chuẩn hóa x ∈ [0, 1]³
+    
+    Mất mát có dạng r_K² + r_σ² + alpha·A với r_K = √BIG·max(K_min - K, 0) và r_σ = 10·σ,
+    nên ma trận Gauss-Newton 2·JᵀJ là xấp xỉ tốt của Hessian.
+    """
+    n, m, xi = lows + spans * x
+    state = physics_gradients(n, xi, m, columns['H'], columns['gamma_bt'], columns['gamma_n'],
+                              columns['f'], columns['C'], columns['a1'])
+    sigma, K, A = state['sigma'], state['K'], state['A']
+    violation = np.maximum(K_min - K, 0)
+    
+    # Đạo hàm theo biến chuẩn hóa: d/dx = span · d/d(n, m, xi)
+    jac_K = -np.sqrt(BIG_PENALTY) * (violation > 0) * state['d_K'] * spans
+    jac_sigma = 10 * state['d_sigma'] * spans
+    grad = (-2 * BIG_PENALTY * violation * state['d_K'] + 200 * sigma * state['d_sigma']
+            + alpha * state['d_A']) * spans
+    
+    return {
+        'n': n, 'm': m, 'xi': xi, 'sigma': sigma, 'K': K, 'A': A,
+        'loss': BIG_PENALTY * violation**2 + 100 * sigma**2 + alpha * A,
+        'grad': grad, 'jac_K': jac_K, 'jac_sigma': jac_sigma
+    }
+
+def optimize_sections_np(
+    scenarios: Any,
+    alpha: Any = 0.01,
+    k_factor: Any = 1.0,
+    epochs: int = 500,
+    tol: float = 1e-10,
+    keep_history: bool = True,
+    verbose: bool = False,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    progress_every: int = 10,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> List[Dict]:
+    """
+    Tối ưu trực tiếp (n, m, xi) cho nhiều kịch bản bằng gradient giải tích
+    
+    Dùng phương pháp Levenberg-Marquardt có chiếu vào miền cho phép: mỗi vòng lặp giải
+    một hệ 3×3 (2·JᵀJ + λI)·δ = -g cho từng kịch bản, chấp nhận bước nếu mất mát giảm
+    (giảm λ) và ngược lại thì tăng λ. Mọi phép tính được vector hóa trên toàn bộ kịch bản,
+    mỗi kịch bản dừng riêng khi mất mát không còn giảm đáng kể.
+    
+    Args:
+        scenarios: DataFrame, dict các mảng hoặc list các dict (xem scenario_columns)
+        alpha: Hệ số phạt diện tích (số thực hoặc mảng theo kịch bản)
+        k_factor: Hệ số nhân cho Kc (số thực hoặc mảng theo kịch bản)
+        epochs: Số vòng lặp tối đa
+        tol: Ngưỡng thay đổi tương đối của mất mát để coi là hội tụ
+        keep_history: Lưu lịch sử mất mát của từng kịch bản
+        verbose: Hiển thị thông tin trong quá trình tính toán
+        progress: Hàm nhận báo cáo tiến trình (epoch, epochs, elapsed, epochs_per_second và mảng
+            loss, n, m, xi, K, sigma theo kịch bản) mỗi `progress_every` vòng lặp và khi kết thúc
+        progress_every: Chu kỳ báo cáo tiến trình (vòng lặp)
+        should_stop: Hàm được gọi mỗi vòng lặp; trả về True để hủy tính toán (ném
+            OptimizationCancelled)
+    
+    Returns:
+        List[Dict]: Kết quả của từng kịch bản theo đúng thứ tự đầu vào, cùng cấu trúc
+        với optimize_dam_sections. Lý do dừng là 'loss_plateau' khi mất mát không còn giảm
+        đáng kể, 'no_progress' khi không tìm được bước giảm mất mát dù λ đã đạt giới hạn
+    """
+    columns = scenario_columns(scenarios)
+    size = len(columns['H'])
+    K_min = columns['Kc'] * k_factor
+    
+    lows = np.array([N_RANGE[0], M_RANGE[0], XI_RANGE[0]])[:, None]
+    spans = np.array([N_RANGE[1] - N_RANGE[0], M_RANGE[1] - M_RANGE[0], XI_RANGE[1] - XI_RANGE[0]])[:, None]
+    
+    # Khởi tạo tại tâm miền giá trị (giống đầu ra ban đầu của OptimalParamsNet)
+    x = np.full((3, size), 0.5)
+    current = _evaluate(x, lows, spans, columns, K_min, alpha)
+    damping = np.full(size, 1.0)
+    identity = np.eye(3)
+    
+    stopped_epoch = np.full(size, epochs, dtype=np.int64)
+    stop_reason = np.zeros(size, dtype=np.int64)
+    active = np.ones(size, dtype=bool)
+    history = np.empty((epochs, size), dtype=np.float32) if keep_history else None
+    
+    start_time = time.time()
+    
+    for epoch in range(epochs):
+        if should_stop is not None and should_stop():
+            raise OptimizationCancelled(f"Tính toán bị hủy tại epoch {epoch}")
+        
+        if history is not None:
+            history[epoch] = current['loss']
+        
+        # Ma trận Gauss-Newton (size, 3, 3) và bước Levenberg-Marquardt
+        jac_K = current['jac_K'].T
+        jac_sigma = current['jac_sigma'].T
+        gauss_newton = 2 * (jac_K[:, :, None] * jac_K[:, None, :] + jac_sigma[:, :, None] * jac_sigma[:, None, :])
+        system = gauss_newton + damping[:, None, None] * identity
+        step = -np.linalg.solve(system, current['grad'].T[:, :, None])[:, :, 0].T
+        candidate_x = np.clip(x + step, 0.0, 1.0)
+        
+        candidate = _evaluate(candidate_x, lows, spans, columns, K_min, alpha)
+        accepted = active & (candidate['loss'] < current['loss'])
+        improvement = (current['loss'] - candidate['loss']) / np.maximum(np.abs(current['loss']), 1e-12)
+        
+        x = np.where(accepted, candidate_x, x)
+        for key, value in candidate.items():
+            current[key] = np.where(accepted, value, current[key])
+        damping = np.where(accepted, damping / 3, damping * 4)
+        damping = np.clip(damping, 1e-12, 1e12)
+        
+        # Hội tụ khi bước được chấp nhận nhưng gần như không cải thiện,
+        # hoặc khi không còn bước nào làm giảm mất mát
+        plateau = accepted & (improvement < tol)
+        stuck = active & ~accepted & (damping >= 1e12)
+        newly_stopped = plateau | stuck
+        stopped_epoch = np.where(newly_stopped, epoch + 1, stopped_epoch)
+        stop_reason = np.where(plateau, STOP_REASONS.index('loss_plateau'),
+                               np.where(stuck, STOP_REASONS.index('no_progress'), stop_reason))
+        active = active & ~newly_stopped
+        
+        if verbose and epoch % 50 == 0:
+            print(f"Epoch {epoch}: Loss = {current['loss'].sum():.6f}")
+        
+        converged = not active.any()
+        if progress is not None and ((epoch + 1) % progress_every == 0 or converged or epoch + 1 == epochs):
+            elapsed = time.time() - start_time
+            report = {
+                'epoch': epoch + 1,
+                'epochs': epochs,
+                'elapsed': elapsed,
+                'epochs_per_second': (epoch + 1) / elapsed if elapsed > 0 else float('inf')
+            }
+            report.update({key: current[key].copy() for key in ('loss', 'n', 'm', 'xi', 'K', 'sigma')})
+            progress(report)
+        
+        if converged:
+            if verbose:
+                print(f"Hội tụ tại epoch {epoch + 1}")
+            break
+    
+    elapsed_time = time.time() - start_time
+    
+    results = []
+    for i in range(size):
+        result = {key: float(current[key][i]) for key in ('n', 'm', 'xi', 'A', 'K', 'sigma')}
+        row_history = history[:int(stopped_epoch[i]), i] if history is not None else np.empty(0)
+        result.update({
+            'loss_history': row_history.tolist(),
+            'final_loss': float(current['loss'][i]),
+            'min_loss': float(current['loss'][i]),
+            'computation_time': elapsed_time / size,
+            'batch_time': elapsed_time,
+            'batch_size': size,
+            'stopped_epoch': int(stopped_epoch[i]),
+            'stop_reason': STOP_REASONS[int(stop_reason[i])]
+        })
+        result.update({name: float(columns[name][i]) for name in INPUT_NAMES})
+        results.append(result)
+    
+    return results
@@ -8,7 +8,40 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 import time
-from typing import Dict, List, Tuple, Union, Optional
+import warnings
+from typing import Any, Callable, Dict, List, Tuple, Union, Optional
+
+from modules.numpy_engine import (
+    INPUT_NAMES, INPUT_BOUNDS, STOP_REASONS, OptimizationCancelled, scenario_columns, optimize_sections_np
+)
+from modules.global_search import global_search
+
+ENGINES = ('pinn', 'numpy', 'grid')
+
+DEFAULT_SURROGATE_PATH = "data/surrogate.pt"
+
+# Tốc độ học khi khởi tạo từ nghiệm đã biết: đủ nhỏ để bước Adam đầu tiên không đẩy mạng ra xa
+WARM_START_LR = 3e-4
+
+def _scale_outputs(out: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Đưa đầu ra sigmoid về miền giá trị của (n, m, xi)"""
+    n = out[:, 0] * 0.4             # n ∈ [0, 0.4]
+    m = out[:, 1] * 3.5 + 0.5       # m ∈ [0.5, 4.0]
+    xi = out[:, 2] * 0.99 + 0.01    # xi ∈ (0.01, 1]
+    return n, m, xi
+
+def _target_logits(targets: torch.Tensor, eps: float = 1e-2) -> torch.Tensor:
+    """
+    Phép ngược của _scale_outputs: giá trị trước sigmoid cho (n, m, xi) cho trước
+    
+    Args:
+        targets: Tensor kích thước (batch, 3) theo thứ tự (n, m, xi)
+        eps: Khoảng cách tối thiểu tới biên, tránh sigmoid bão hòa làm mất gradient
+    """
+    low = torch.tensor([0.0, 0.5, 0.01], device=targets.device)
+    span = torch.tensor([0.4, 3.5, 0.99], device=targets.device)
+    unit = ((targets - low) / span).clamp(eps, 1 - eps)
+    return torch.log(unit / (1 - unit))
 
 class OptimalParamsNet(nn.Module):
     """
@@ -25,10 +58,107 @@ class OptimalParamsNet(nn.Module):
     def forward(self, x):
         out = self.net(x)
         # Giới hạn đầu ra
-        n = out[:, 0] * 0.4             # n ∈ [0, 0.4]
-        m = out[:, 1] * 3.5 + 0.5       # m ∈ [0.5, 4.0]
-        xi = out[:, 2] * 0.99 + 0.01    # xi ∈ (0.01, 1]
-        return n, m, xi
+        return _scale_outputs(out)
+
+    @torch.no_grad()
+    def warm_start(self, x: torch.Tensor, targets: torch.Tensor) -> None:
+        """
+        Dịch bias lớp đầu ra để đầu ra ban đầu với đầu vào x bằng đúng (n, m, xi) cho trước
+        
+        Args:
+            x: Đầu vào của mạng, kích thước (1, 1)
+            targets: Tensor kích thước (1, 3) theo thứ tự (n, m, xi)
+        """
+        hidden = self.net[:-2](x)
+        output_layer = self.net[-2]
+        output_layer.bias.copy_((_target_logits(targets) - hidden @ output_layer.weight.T)[0])
+
+class BatchedOptimalParamsNet(nn.Module):
+    """
+    Tập hợp nhiều mạng OptimalParamsNet độc lập, mỗi kịch bản tính toán một bộ trọng số riêng.
+    
+    Các lớp tuyến tính được lưu dưới dạng tensor (batch, in, out) và tính bằng phép nhân
+    ma trận theo lô, nên một vòng lặp huấn luyện cập nhật đồng thời tất cả các kịch bản
+    mà gradient của mỗi kịch bản vẫn hoàn toàn tách biệt.
+    """
+    def __init__(self, batch_size: int, hidden: int = 64):
+        super().__init__()
+        self.batch_size = batch_size
+        self.w1, self.b1 = self._init_layer(batch_size, 1, hidden)
+        self.w2, self.b2 = self._init_layer(batch_size, hidden, hidden)
+        self.w3, self.b3 = self._init_layer(batch_size, hidden, 3)
+
+    @staticmethod
+    def _init_layer(batch_size: int, fan_in: int, fan_out: int) -> Tuple[nn.Parameter, nn.Parameter]:
+        # Khởi tạo giống nn.Linear: U(-1/sqrt(fan_in), 1/sqrt(fan_in))
+        bound = 1.0 / np.sqrt(fan_in)
+        weight = torch.empty(batch_size, fan_in, fan_out).uniform_(-bound, bound)
+        bias = torch.empty(batch_size, 1, fan_out).uniform_(-bound, bound)
+        return nn.Parameter(weight), nn.Parameter(bias)
+
+    def forward(self, x):
+        # x: (batch, in) -> (batch, 1, in)
+        h = torch.tanh(torch.baddbmm(self.b1, x.unsqueeze(1), self.w1))
+        h = torch.tanh(torch.baddbmm(self.b2, h, self.w2))
+        out = torch.sigmoid(torch.baddbmm(self.b3, h, self.w3)).squeeze(1)
+        return _scale_outputs(out)
+
+    @torch.no_grad()
+    def warm_start(self, x: torch.Tensor, targets: torch.Tensor, mask: Optional[torch.Tensor] = None) -> None:
+        """
+        Dịch bias lớp đầu ra để đầu ra ban đầu của từng kịch bản bằng (n, m, xi) cho trước
+        
+        Args:
+            x: Đầu vào của mạng, kích thước (batch, 1)
+            targets: Tensor kích thước (batch, 3) theo thứ tự (n, m, xi)
+            mask: Tensor bool (batch,) chọn các kịch bản được khởi tạo (nếu None, tất cả)
+        """
+        h = torch.tanh(torch.baddbmm(self.b1, x.unsqueeze(1), self.w1))
+        h = torch.tanh(torch.baddbmm(self.b2, h, self.w2))
+        bias = _target_logits(targets).unsqueeze(1) - torch.bmm(h, self.w3)
+        if mask is not None:
+            bias = torch.where(mask[:, None, None], bias, self.b3)
+        self.b3.copy_(bias)
+
+class ParametricParamsNet(nn.Module):
+    """
+    Mạng thay thế (surrogate) ánh xạ trực tiếp các thông số đầu vào sang tham số tối ưu
+    
+    Đầu vào là (H, gamma_bt, gamma_n, f, C, Kc, a1) đã chuẩn hóa về [-1, 1] theo INPUT_BOUNDS,
+    nên sau khi huấn luyện một lần trên toàn miền, mỗi truy vấn chỉ cần một lần lan truyền thuận.
+    """
+    def __init__(self, hidden: int = 128):
+        super().__init__()
+        self.hidden = hidden
+        self.net = nn.Sequential(
+            nn.Linear(len(INPUT_NAMES), hidden), nn.Tanh(),
+            nn.Linear(hidden, hidden), nn.Tanh(),
+            nn.Linear(hidden, hidden), nn.Tanh(),
+            nn.Linear(hidden, 3), nn.Sigmoid()
+        )
+
+    def forward(self, x):
+        out = self.net(x)
+        return _scale_outputs(out)
+
+def normalize_inputs(inputs: Dict[str, Union[float, torch.Tensor]], device: Optional[str] = None) -> torch.Tensor:
+    """
+    Chuẩn hóa các thông số đầu vào về [-1, 1] theo INPUT_BOUNDS
+    
+    Args:
+        inputs: Dict chứa các thông số H, gamma_bt, gamma_n, f, C, Kc, a1 (số thực hoặc tensor 1 chiều)
+        device: Thiết bị tính toán
+        
+    Returns:
+        Tensor kích thước (batch, 7)
+    """
+    columns = []
+    for name in INPUT_NAMES:
+        low, high = INPUT_BOUNDS[name]
+        value = torch.as_tensor(inputs[name], dtype=torch.float32, device=device).reshape(-1)
+        columns.append(2 * (value - low) / (high - low) - 1)
+    size = max(column.shape[0] for column in columns)
+    return torch.stack([column.expand(size) for column in columns], dim=1)
 
 def compute_physics(n: torch.Tensor, xi: torch.Tensor, m: torch.Tensor, H: float, 
                    gamma_bt: float, gamma_n: float, f: float, C: float, a1: float) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
@@ -73,8 +203,64 @@ def compute_physics(n: torch.Tensor, xi: torch.Tensor, m: torch.Tensor, H: float
     A = 0.5 * H**2 * (m + n * (1 - xi)**2)
     return sigma, K, A
 
+# Thứ tự các biến và đại lượng trong ma trận Jacobian của compute_sensitivities
+SENSITIVITY_VARIABLES = ('n', 'm', 'xi', 'H', 'gamma_bt', 'gamma_n', 'f', 'C', 'a1')
+SENSITIVITY_OUTPUTS = ('A', 'K', 'sigma')
+
+def compute_sensitivities(results: Any, device: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Tính ma trận Jacobian của (A, K, σ) theo biến thiết kế (n, m, xi) và thông số vật liệu
+    (H, gamma_bt, gamma_n, f, C, a1) cho nhiều kết quả cùng lúc
+    
+    Mỗi kết quả là một hàng độc lập nên toàn bộ Jacobian được tính bằng một lần gọi autograd
+    theo lô (is_grads_batched), không cần chạy lại bằng sai phân hữu hạn.
+    
+    Args:
+        results: Một kết quả tính toán (dict), list các kết quả hoặc DataFrame
+        device: Thiết bị tính toán (CPU/GPU)
+        
+    Returns:
+        Dict gồm:
+            jacobian: Mảng (số kết quả, 3, 9) các đạo hàm ∂y/∂x
+            elasticity: Mảng cùng kích thước các độ nhạy tương đối (∂y/∂x)·x/y
+            values: Mảng (số kết quả, 3) giá trị (A, K, σ)
+            inputs: Mảng (số kết quả, 9) giá trị các biến
+            outputs, variables: Tên các hàng và cột theo SENSITIVITY_OUTPUTS, SENSITIVITY_VARIABLES
+    """
+    if isinstance(results, dict):
+        results = [results]
+    if hasattr(results, 'to_dict') and hasattr(results, 'columns'):
+        results = results.to_dict('records')
+    
+    x = torch.tensor([[float(result[name]) for name in SENSITIVITY_VARIABLES] for result in results],
+                     dtype=torch.float64, device=device, requires_grad=True)
+    n, m, xi, H, gamma_bt, gamma_n, f, C, a1 = x.unbind(dim=1)
+    sigma, K, A = compute_physics(n, xi, m, H, gamma_bt, gamma_n, f, C, a1)
+    y = torch.stack([A, K, sigma], dim=1)
+    
+    # Các hàng độc lập nên gradient của tổng theo x cho đúng đạo hàm của từng hàng;
+    # ba đầu ra được tính trong một lần gọi với vector ngược theo lô
+    basis = torch.eye(3, dtype=y.dtype, device=y.device)[:, None, :].expand(3, *y.shape)
+    (grads,) = torch.autograd.grad(y, x, grad_outputs=basis, is_grads_batched=True)
+    jacobian = grads.permute(1, 0, 2).detach().cpu().numpy()
+    
+    values = y.detach().cpu().numpy()
+    inputs = x.detach().cpu().numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        elasticity = jacobian * inputs[:, None, :] / values[:, :, None]
+    
+    return {
+        'jacobian': jacobian,
+        'elasticity': elasticity,
+        'values': values,
+        'inputs': inputs,
+        'outputs': SENSITIVITY_OUTPUTS,
+        'variables': SENSITIVITY_VARIABLES
+    }
+
 def loss_function(sigma: torch.Tensor, K: torch.Tensor, A: torch.Tensor, 
-                 Kc: float, factor: float = 1.0, alpha: float = 0.01) -> torch.Tensor:
+                 Kc: Union[float, torch.Tensor], factor: Union[float, torch.Tensor] = 1.0,
+                 alpha: Union[float, torch.Tensor] = 0.01, reduction: str = 'mean') -> torch.Tensor:
     """
     Hàm mất mát để tối ưu hóa mặt cắt đập
     
@@ -82,9 +268,10 @@ def loss_function(sigma: torch.Tensor, K: torch.Tensor, A: torch.Tensor,
         sigma: Ứng suất mép thượng lưu
         K: Hệ số ổn định
         A: Diện tích mặt cắt
-        Kc: Hệ số ổn định yêu cầu
+        Kc: Hệ số ổn định yêu cầu (số thực hoặc tensor theo từng kịch bản)
         factor: Hệ số nhân cho Kc (mặc định: 1.0)
         alpha: Hệ số phạt diện tích (mặc định: 0.01)
+        reduction: 'mean' trả về giá trị trung bình, 'none' trả về mất mát của từng kịch bản
         
     Returns:
         Giá trị hàm mất mát
@@ -94,8 +281,330 @@ def loss_function(sigma: torch.Tensor, K: torch.Tensor, A: torch.Tensor,
     penalty_K = torch.clamp(K_min - K, min=0)**2
     penalty_K = BIG_PENALTY * penalty_K
     penalty_sigma = sigma**2
+    if reduction == 'none':
+        return penalty_K + 100 * penalty_sigma + alpha * A
     return penalty_K.mean() + 100 * penalty_sigma.mean() + alpha * A.mean()
 
+def _physics_loss_kernel(n: torch.Tensor, m: torch.Tensor, xi: torch.Tensor, H: torch.Tensor,
+                         gamma_bt: torch.Tensor, gamma_n: torch.Tensor, f: torch.Tensor, C: torch.Tensor,
+                         Kc: torch.Tensor, a1: torch.Tensor, k_factor: torch.Tensor,
+                         alpha: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    compute_physics và loss_function (reduction='none') gộp trong một hàm chỉ nhận tensor,
+    để TorchScript có thể biên dịch thành một đồ thị duy nhất
+    """
+    s = 1 - xi
+    p = n * s
+    H2 = H * H
+    B = H * (m + p)
+    G1 = 0.5 * gamma_bt * m * H2
+    G2 = 0.5 * gamma_bt * n * H2 * s * s
+    W1 = 0.5 * gamma_n * H2
+    W2_1 = gamma_n * p * xi * H2
+    W2_2 = 0.5 * gamma_n * n * H2 * s * s
+    Wt = 0.5 * gamma_n * a1 * H2 * (m + p)
+    P = G1 + G2 + W2_1 + W2_2 - Wt
+    lG1 = H * (m / 6 - p / 2)
+    lG2 = H * (m / 2 - p / 6)
+    lt = H * (m + p) / 6
+    l2 = H * m / 2
+    l22 = H * m / 2 + H * p / 6
+    l1 = H / 3
+    M0 = -G1 * lG1 - G2 * lG2 + Wt * lt - W2_1 * l2 - W2_2 * l22 + W1 * l1
+    sigma = P / B - 6 * M0 / (B * B)
+    K = (f * P + C * H * (m + p)) / W1
+    A = 0.5 * H2 * (m + n * s * s)
+    penalty_K = torch.clamp(Kc * k_factor - K, min=0)
+    row_loss = 1e5 * penalty_K * penalty_K + 100 * sigma * sigma + alpha * A
+    return sigma, K, A, row_loss
+
+def _objective_candidates(
+    model: nn.Module,
+    inputs: Dict[str, Union[float, torch.Tensor]],
+    alpha: Union[float, torch.Tensor],
+    k_factor: Union[float, torch.Tensor],
+    device: torch.device,
+    compiled: bool
+) -> List[Tuple[str, Callable]]:
+    """
+    Tạo danh sách các cách tính (mô hình → vật lý → mất mát) theo thứ tự ưu tiên
+    
+    Khi compiled=True, thử torch.compile cho toàn bộ đồ thị (PyTorch 2.x), sau đó TorchScript
+    cho phần vật lý và mất mát; chế độ eager luôn là lựa chọn cuối cùng. Lỗi biên dịch chỉ xuất
+    hiện ở lần gọi đầu tiên nên vòng lặp huấn luyện sẽ chuyển sang lựa chọn tiếp theo khi gặp lỗi.
+    """
+    H, gamma_bt, gamma_n = inputs['H'], inputs['gamma_bt'], inputs['gamma_n']
+    f, C, Kc, a1 = inputs['f'], inputs['C'], inputs['Kc'], inputs['a1']
+    
+    def eager(data):
+        n, m, xi = model(data)
+        sigma, K, A = compute_physics(n, xi, m, H, gamma_bt, gamma_n, f, C, a1)
+        row_loss = loss_function(sigma, K, A, Kc, k_factor, alpha, reduction='none')
+        return row_loss, n, m, xi, sigma, K, A
+    
+    candidates = []
+    if compiled:
+        tensors = [torch.as_tensor(value, dtype=torch.float32, device=device)
+                   for value in (H, gamma_bt, gamma_n, f, C, Kc, a1, k_factor, alpha)]
+        
+        def fused(data):
+            n, m, xi = model(data)
+            sigma, K, A, row_loss = _physics_loss_kernel(n, m, xi, *tensors)
+            return row_loss, n, m, xi, sigma, K, A
+        
+        if hasattr(torch, 'compile'):
+            try:
+                candidates.append(('torch.compile', torch.compile(fused)))
+            except Exception:
+                pass
+        try:
+            # torch.jit.script bị đánh dấu lỗi thời ở các bản PyTorch mới nhưng vẫn là phương án dự phòng
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', FutureWarning)
+                kernel = torch.jit.script(_physics_loss_kernel)
+            
+            def scripted(data):
+                n, m, xi = model(data)
+                sigma, K, A, row_loss = kernel(n, m, xi, *tensors)
+                return row_loss, n, m, xi, sigma, K, A
+            
+            candidates.append(('torchscript', scripted))
+        except Exception:
+            pass
+    
+    candidates.append(('eager', eager))
+    return candidates
+
+class EarlyStopping:
+    """
+    Tiêu chí dừng sớm cho vòng lặp huấn luyện
+    
+    Một kịch bản được coi là hội tụ khi các ràng buộc được thỏa mãn (K ≥ Kc·k_factor và σ ≤ 0
+    trong phạm vi sai số) và trong cửa sổ `window` vòng lặp gần nhất hoặc mất mát thay đổi
+    tương đối ít hơn `loss_tol`, hoặc (n, m, xi) dịch chuyển ít hơn `param_tol`.
+    Việc kiểm tra chỉ thực hiện mỗi `check_every` vòng lặp để hạn chế đồng bộ hóa thiết bị.
+    """
+    def __init__(
+        self,
+        window: int = 200,
+        loss_tol: float = 1e-3,
+        param_tol: float = 5e-4,
+        constraint_tol: float = 2e-3,
+        sigma_tol: float = 0.05,
+        check_every: int = 50,
+        min_epochs: int = 500
+    ):
+        """
+        Args:
+            window: Số vòng lặp dùng để so sánh mất mát và tham số
+            loss_tol: Ngưỡng thay đổi tương đối của mất mát trong cửa sổ
+            param_tol: Ngưỡng dịch chuyển tuyệt đối lớn nhất của (n, m, xi) trong cửa sổ
+            constraint_tol: Sai số tương đối cho điều kiện K ≥ Kc·k_factor
+            sigma_tol: Sai số cho điều kiện σ ≤ 0 (T/m²)
+            check_every: Chu kỳ kiểm tra (vòng lặp)
+            min_epochs: Số vòng lặp tối thiểu trước khi được dừng
+        """
+        if window < check_every or window % check_every != 0:
+            raise ValueError("window phải là bội số của check_every")
+        self.window = window
+        self.loss_tol = loss_tol
+        self.param_tol = param_tol
+        self.constraint_tol = constraint_tol
+        self.sigma_tol = sigma_tol
+        self.check_every = check_every
+        self.min_epochs = min_epochs
+
+    def check(
+        self,
+        current: Dict[str, torch.Tensor],
+        previous: Dict[str, torch.Tensor],
+        K_min: Union[float, torch.Tensor]
+    ) -> torch.Tensor:
+        """
+        Đánh giá tiêu chí dừng cho từng kịch bản
+        
+        Args:
+            current: Trạng thái hiện tại (loss, n, m, xi, sigma, K)
+            previous: Trạng thái cách đây `window` vòng lặp
+            K_min: Hệ số ổn định tối thiểu Kc·k_factor
+            
+        Returns:
+            Tensor mã lý do dừng theo STOP_REASONS (0: chưa dừng)
+        """
+        feasible = (current['K'] >= K_min * (1 - self.constraint_tol)) & (current['sigma'] <= self.sigma_tol)
+        
+        loss_change = (current['loss'] - previous['loss']).abs() / previous['loss'].abs().clamp(min=1e-12)
+        drift = torch.stack([(current[key] - previous[key]).abs() for key in ('n', 'm', 'xi')]).amax(dim=0)
+        
+        reason = torch.zeros_like(current['loss'], dtype=torch.long)
+        reason = torch.where(feasible & (drift < self.param_tol), torch.full_like(reason, 2), reason)
+        reason = torch.where(feasible & (loss_change < self.loss_tol), torch.full_like(reason, 1), reason)
+        return reason
+
+def _progress_report(epoch: int, epochs: int, start_time: float,
+                     values: Dict[str, torch.Tensor]) -> Dict[str, Any]:
+    """
+    Tạo báo cáo tiến trình cho hàm progress của vòng lặp huấn luyện
+    
+    Các giá trị được gộp thành một tensor trước khi chuyển về CPU nên mỗi báo cáo chỉ
+    đồng bộ hóa thiết bị một lần.
+    
+    Args:
+        epoch: Số vòng lặp đã chạy
+        epochs: Số vòng lặp tối đa
+        start_time: Thời điểm bắt đầu huấn luyện
+        values: Các tensor loss, n, m, xi, K, sigma theo kịch bản
+    
+    Returns:
+        Dict gồm epoch, epochs, thời gian đã chạy, tốc độ (vòng lặp/giây) và mảng giá trị
+        hiện tại của từng kịch bản
+    """
+    names = ('loss', 'n', 'm', 'xi', 'K', 'sigma')
+    stacked = torch.stack([values[name].detach().reshape(-1).float() for name in names]).cpu().numpy()
+    elapsed = time.time() - start_time
+    report = {
+        'epoch': epoch,
+        'epochs': epochs,
+        'elapsed': elapsed,
+        'epochs_per_second': epoch / elapsed if elapsed > 0 else float('inf')
+    }
+    report.update(zip(names, stacked))
+    return report
+
+def _single_progress(progress: Callable[[Dict[str, Any]], None]) -> Callable[[Dict[str, Any]], None]:
+    """Bọc hàm progress để nhận giá trị số thực thay cho mảng một phần tử (tính toán đơn lẻ)"""
+    def report(values: Dict[str, Any]) -> None:
+        progress({key: float(value[0]) if isinstance(value, np.ndarray) else value
+                  for key, value in values.items()})
+    return report
+
+def _train_params(
+    model: nn.Module,
+    data: torch.Tensor,
+    inputs: Dict[str, Union[float, torch.Tensor]],
+    alpha: Union[float, torch.Tensor],
+    k_factor: Union[float, torch.Tensor],
+    epochs: int,
+    verbose: bool,
+    lr: float = 1e-3,
+    early_stopping: Optional[EarlyStopping] = None,
+    compiled: bool = False,
+    should_stop: Optional[Callable[[], bool]] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    progress_every: int = 100
+) -> Dict:
+    """
+    Vòng lặp huấn luyện dùng chung cho tính toán đơn lẻ và theo lô
+    
+    Mất mát của các kịch bản được cộng lại trước khi lan truyền ngược; vì mỗi kịch bản có
+    trọng số riêng nên tổng này cho đúng gradient của từng bài toán độc lập. Khi dừng sớm,
+    kết quả của mỗi kịch bản được chốt tại vòng lặp nó hội tụ; vòng lặp kết thúc khi tất cả
+    các kịch bản đã hội tụ. Nếu should_stop trả về True, vòng lặp dừng bằng OptimizationCancelled.
+    Hàm progress (nếu có) nhận báo cáo của _progress_report mỗi `progress_every` vòng lặp và
+    một lần khi kết thúc; giữa các lần báo cáo không có đồng bộ hóa thiết bị nào.
+    
+    Returns:
+        Dict gồm các tensor n, m, xi, sigma, K, A cuối cùng, lịch sử mất mát (epochs, batch),
+        số vòng lặp đã chạy, mã lý do dừng của từng kịch bản và chế độ tính đã dùng (compile_mode)
+    """
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr)
+    
+    H, gamma_bt, gamma_n = inputs['H'], inputs['gamma_bt'], inputs['gamma_n']
+    f, C, Kc, a1 = inputs['f'], inputs['C'], inputs['Kc'], inputs['a1']
+    
+    candidates = _objective_candidates(model, inputs, alpha, k_factor, data.device, compiled)
+    compile_mode, objective = candidates.pop(0)
+    
+    batch_size = data.shape[0]
+    stopped_epoch = torch.full((batch_size,), epochs, dtype=torch.long, device=data.device)
+    stop_reason = torch.zeros(batch_size, dtype=torch.long, device=data.device)
+    snapshot = None
+    checkpoints = []
+    
+    # Lưu mất mát dưới dạng tensor để tránh đồng bộ hóa thiết bị ở mỗi vòng lặp
+    loss_rows = []
+    current = None
+    start_time = time.time()
+    
+    for epoch in range(epochs):
+        if should_stop is not None and should_stop():
+            raise OptimizationCancelled(f"Tính toán bị hủy tại epoch {epoch}")
+        optimizer.zero_grad()
+        while True:
+            try:
+                row_loss, n, m, xi, sigma, K, A = objective(data)
+                break
+            except Exception as exc:
+                # Biên dịch thất bại ở lần gọi đầu tiên: chuyển sang chế độ dự phòng
+                if epoch > 0 or not candidates:
+                    raise
+                warnings.warn(f"Không dùng được chế độ {compile_mode} ({exc}), chuyển sang {candidates[0][0]}")
+                compile_mode, objective = candidates.pop(0)
+        loss = row_loss.sum()
+        loss.backward()
+        optimizer.step()
+        loss_rows.append(row_loss.detach())
+        
+        current = {'loss': row_loss, 'n': n, 'm': m, 'xi': xi, 'sigma': sigma, 'K': K, 'A': A}
+        
+        if verbose and epoch % 500 == 0:
+            elapsed = time.time() - start_time
+            speed = f", {epoch / elapsed:.0f} epoch/s" if epoch > 0 and elapsed > 0 else ""
+            print(f"Epoch {epoch}: Loss = {loss.item():.6f}{speed}")
+        
+        if progress is not None and (epoch + 1) % progress_every == 0:
+            progress(_progress_report(epoch + 1, epochs, start_time, current))
+        
+        if early_stopping is not None and epoch % early_stopping.check_every == 0:
+            current = {key: value.detach() for key, value in current.items()}
+            checkpoints.append(current)
+            if len(checkpoints) > early_stopping.window // early_stopping.check_every + 1:
+                checkpoints.pop(0)
+            
+            if epoch + 1 >= early_stopping.min_epochs and len(checkpoints) > early_stopping.window // early_stopping.check_every:
+                reason = early_stopping.check(current, checkpoints[0], Kc * k_factor)
+                newly_stopped = (reason > 0) & (stop_reason == 0)
+                if snapshot is None:
+                    snapshot = {key: value.clone() for key, value in current.items()}
+                for key in snapshot:
+                    snapshot[key] = torch.where(newly_stopped, current[key], snapshot[key])
+                stopped_epoch = torch.where(newly_stopped, torch.full_like(stopped_epoch, epoch + 1), stopped_epoch)
+                stop_reason = torch.where(newly_stopped, reason, stop_reason)
+                
+                if bool((stop_reason > 0).all()):
+                    if verbose:
+                        print(f"Dừng sớm tại epoch {epoch + 1}")
+                    break
+    
+    # Báo cáo cuối cùng khi lần báo cáo gần nhất không rơi vào vòng lặp kết thúc
+    if progress is not None and current is not None and (epoch + 1) % progress_every != 0:
+        progress(_progress_report(epoch + 1, epochs, start_time, current))
+    
+    # Tính toán kết quả cuối cùng
+    model.eval()
+    with torch.no_grad():
+        n, m, xi = model(data)
+        sigma, K, A = compute_physics(n, xi, m, H, gamma_bt, gamma_n, f, C, a1)
+    
+    final = {'n': n, 'm': m, 'xi': xi, 'sigma': sigma, 'K': K, 'A': A}
+    if snapshot is not None:
+        stopped = stop_reason > 0
+        final = {key: torch.where(stopped, snapshot[key], value.expand_as(snapshot[key]))
+                 for key, value in final.items()}
+    
+    if loss_rows:
+        loss_history = torch.stack(loss_rows).cpu()
+    else:
+        loss_history = torch.empty((0, batch_size))
+    
+    final.update({
+        'loss_history': loss_history,
+        'stopped_epoch': stopped_epoch.cpu(),
+        'stop_reason': stop_reason.cpu(),
+        'compile_mode': compile_mode
+    })
+    return final
+
 def optimize_dam_section(
     H: float,
     gamma_bt: float = 2.4,
@@ -108,7 +617,15 @@ def optimize_dam_section(
     k_factor: float = 1.0,
     epochs: int = 5000,
     device: Optional[str] = None,
-    verbose: bool = True
+    verbose: bool = True,
+    early_stopping: Optional[EarlyStopping] = None,
+    engine: str = 'pinn',
+    compiled: bool = False,
+    warm_start: Optional[Tuple[float, float, float]] = None,
+    seed: Optional[int] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    progress_every: int = 100
 ) -> Dict:
     """
     Tính toán tối ưu mặt cắt đập bê tông trọng lực sử dụng PINNs
@@ -126,63 +643,523 @@ def optimize_dam_section(
         epochs: Số vòng lặp tối đa
         device: Thiết bị tính toán (CPU/GPU)
         verbose: Hiển thị thông tin trong quá trình tính toán
+        early_stopping: Tiêu chí dừng sớm (nếu None, chạy đủ số vòng lặp)
+        engine: Bộ giải 'pinn' (mạng neural, PyTorch), 'numpy' (tối ưu trực tiếp (n, m, xi)
+            bằng gradient giải tích, tự dừng khi hội tụ) hoặc 'grid' (tìm kiếm lưới toàn cục
+            có chứng nhận sai số tối ưu, xem global_search)
+        compiled: Dùng hàm vật lý + mất mát đã biên dịch (torch.compile, nếu không được thì
+            TorchScript) cho bộ giải 'pinn'; tự quay về chế độ thường nếu biên dịch thất bại
+        warm_start: Nghiệm (n, m, xi) dùng để khởi tạo mạng cho bộ giải 'pinn', thường lấy từ
+            kết quả gần nhất trong cơ sở dữ liệu (DamDatabase.nearest_solution)
+        seed: Hạt giống ngẫu nhiên khởi tạo mạng của bộ giải 'pinn' (nếu None, không cố định)
+        should_stop: Hàm được gọi mỗi vòng lặp của bộ giải 'pinn' hoặc 'numpy'; trả về True để
+            hủy tính toán (ném OptimizationCancelled). Bộ giải 'grid' không dùng tham số này
+        progress: Hàm nhận báo cáo tiến trình của bộ giải 'pinn' hoặc 'numpy': Dict gồm epoch,
+            epochs, elapsed (giây), epochs_per_second và giá trị hiện tại của loss, n, m, xi, K,
+            sigma. Bộ giải 'grid' không có vòng lặp huấn luyện nên không báo cáo tiến trình
+        progress_every: Chu kỳ báo cáo tiến trình (vòng lặp); thiết bị chỉ được đồng bộ hóa
+            khi báo cáo nên chu kỳ lớn gần như không làm chậm vòng lặp
         
     Returns:
-        Dict: Kết quả tính toán bao gồm các tham số tối ưu và các giá trị liên quan
+        Dict: Kết quả tính toán bao gồm các tham số tối ưu và các giá trị liên quan,
+        kèm số vòng lặp đã chạy (stopped_epoch) và lý do dừng (stop_reason)
     """
+    if engine not in ENGINES:
+        raise ValueError(f"Bộ giải không hợp lệ: {engine} (chọn một trong {ENGINES})")
+    
+    if progress is not None:
+        progress = _single_progress(progress)
+    
+    if engine == 'numpy':
+        scenario = {'H': H, 'gamma_bt': gamma_bt, 'gamma_n': gamma_n, 'f': f, 'C': C, 'Kc': Kc, 'a1': a1}
+        result = optimize_sections_np([scenario], alpha=alpha, k_factor=k_factor, epochs=epochs,
+                                      verbose=verbose, progress=progress, progress_every=progress_every,
+                                      should_stop=should_stop)[0]
+        result['computation_time'] = result.pop('batch_time')
+        for key in ('final_loss', 'min_loss', 'batch_size'):
+            result.pop(key)
+        return result
+    
+    if engine == 'grid':
+        return global_search(H, gamma_bt, gamma_n, f, C, Kc, a1, k_factor=k_factor, verbose=verbose)
+    
     # Xác định thiết bị tính toán
     if device is None:
         device = "cuda" if torch.cuda.is_available() else "cpu"
     
-    # Khởi tạo mô hình và tối ưu hóa
+    # Khởi tạo mô hình
+    if seed is not None:
+        torch.manual_seed(seed)
     model = OptimalParamsNet().to(device)
-    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-3)
     
     # Dữ liệu đầu vào
     data = torch.ones((1, 1), device=device)
     
-    # Theo dõi quá trình huấn luyện
-    loss_history = []
+    # Khởi tạo từ nghiệm đã biết
+    lr = 1e-3
+    if warm_start is not None:
+        model.warm_start(data, torch.tensor([warm_start], dtype=torch.float32, device=device))
+        lr = WARM_START_LR
+    
+    inputs = {'H': H, 'gamma_bt': gamma_bt, 'gamma_n': gamma_n, 'f': f, 'C': C, 'Kc': Kc, 'a1': a1}
+    
     start_time = time.time()
     
     # Huấn luyện mô hình
+    state = _train_params(model, data, inputs, alpha, k_factor, epochs, verbose, lr=lr,
+                          early_stopping=early_stopping, compiled=compiled, should_stop=should_stop,
+                          progress=progress, progress_every=progress_every)
+    stopped_epoch = int(state['stopped_epoch'][0])
+    
+    # Tính toán thời gian
+    elapsed_time = time.time() - start_time
+    
+    # Trả về kết quả
+    return {
+        'n': state['n'].item(),
+        'm': state['m'].item(),
+        'xi': state['xi'].item(),
+        'A': state['A'].item(),
+        'K': state['K'].item(),
+        'sigma': state['sigma'].item(),
+        'loss_history': state['loss_history'][:stopped_epoch, 0].tolist(),
+        'computation_time': elapsed_time,
+        'stopped_epoch': stopped_epoch,
+        'stop_reason': STOP_REASONS[int(state['stop_reason'][0])],
+        'compile_mode': state['compile_mode'],
+        'H': H,
+        'gamma_bt': gamma_bt,
+        'gamma_n': gamma_n,
+        'f': f,
+        'C': C,
+        'Kc': Kc,
+        'a1': a1
+    }
+
+def optimize_dam_sections(
+    scenarios: Any,
+    alpha: float = 0.01,
+    k_factor: float = 1.0,
+    epochs: int = 5000,
+    device: Optional[str] = None,
+    verbose: bool = True,
+    early_stopping: Optional[EarlyStopping] = None,
+    engine: str = 'pinn',
+    compiled: bool = False,
+    warm_start: Optional[Any] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    progress_every: int = 100
+) -> List[Dict]:
+    """
+    Tính toán tối ưu đồng thời nhiều mặt cắt đập trong một vòng lặp huấn luyện
+    
+    Mỗi kịch bản có một mạng riêng (BatchedOptimalParamsNet) nên kết quả tương đương với việc
+    gọi optimize_dam_section cho từng kịch bản, nhưng chi phí mỗi vòng lặp được chia sẻ.
+    
+    Args:
+        scenarios: DataFrame, dict các mảng hoặc list các dict với các cột
+            H, gamma_bt, gamma_n, f, C, Kc, a1 (các cột thiếu dùng giá trị mặc định)
+        alpha: Hệ số phạt diện tích
+        k_factor: Hệ số nhân cho Kc
+        epochs: Số vòng lặp tối đa
+        device: Thiết bị tính toán (CPU/GPU)
+        verbose: Hiển thị thông tin trong quá trình tính toán
+        early_stopping: Tiêu chí dừng sớm, áp dụng riêng cho từng kịch bản
+        engine: Bộ giải 'pinn', 'numpy' hoặc 'grid' (xem optimize_dam_section)
+        compiled: Dùng hàm vật lý + mất mát đã biên dịch (xem optimize_dam_section)
+        warm_start: Danh sách nghiệm khởi tạo (n, m, xi) cho từng kịch bản của bộ giải 'pinn';
+            phần tử None (hoặc hàng NaN) giữ khởi tạo ngẫu nhiên
+        progress: Hàm nhận báo cáo tiến trình (xem optimize_dam_section), với giá trị của
+            từng kịch bản dưới dạng mảng
+        progress_every: Chu kỳ báo cáo tiến trình (vòng lặp)
+        
+    Returns:
+        List[Dict]: Kết quả của từng kịch bản theo đúng thứ tự đầu vào
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Bộ giải không hợp lệ: {engine} (chọn một trong {ENGINES})")
+    
+    if engine == 'numpy':
+        return optimize_sections_np(scenarios, alpha=alpha, k_factor=k_factor, epochs=epochs, verbose=verbose,
+                                    progress=progress, progress_every=progress_every)
+    
+    if engine == 'grid':
+        columns = scenario_columns(scenarios)
+        return [global_search(*(float(columns[name][i]) for name in INPUT_NAMES), k_factor=k_factor, verbose=verbose)
+                for i in range(len(columns['H']))]
+    
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    
+    columns = scenario_columns(scenarios)
+    batch_size = len(columns['H'])
+    
+    model = BatchedOptimalParamsNet(batch_size).to(device)
+    data = torch.ones((batch_size, 1), device=device)
+    lr = 1e-3
+    if warm_start is not None:
+        targets = torch.tensor([[np.nan] * 3 if row is None else list(row) for row in warm_start],
+                               dtype=torch.float32, device=device).reshape(batch_size, 3)
+        mask = torch.isfinite(targets).all(dim=1)
+        model.warm_start(data, torch.nan_to_num(targets), mask)
+        # Tốc độ học dùng chung cho cả lô nên chỉ giảm khi mọi kịch bản đều được khởi tạo
+        if bool(mask.all()):
+            lr = WARM_START_LR
+    inputs = {name: torch.tensor(values, dtype=torch.float32, device=device)
+              for name, values in columns.items()}
+    
+    start_time = time.time()
+    state = _train_params(model, data, inputs, alpha, k_factor, epochs, verbose, lr=lr,
+                          early_stopping=early_stopping, compiled=compiled,
+                          progress=progress, progress_every=progress_every)
+    elapsed_time = time.time() - start_time
+    
+    outputs = {key: state[key].cpu().numpy() for key in ('n', 'm', 'xi', 'A', 'K', 'sigma')}
+    loss_history = state['loss_history'].numpy()
+    stopped_epochs = state['stopped_epoch'].numpy()
+    stop_reasons = state['stop_reason'].numpy()
+    
+    results = []
+    for i in range(batch_size):
+        history = loss_history[:int(stopped_epochs[i]), i]
+        result = {key: float(outputs[key][i]) for key in outputs}
+        result.update({
+            'loss_history': history.tolist(),
+            'final_loss': float(history[-1]) if len(history) else float('nan'),
+            'min_loss': float(history.min()) if len(history) else float('nan'),
+            'computation_time': elapsed_time / batch_size,
+            'batch_time': elapsed_time,
+            'batch_size': batch_size,
+            'stopped_epoch': int(stopped_epochs[i]),
+            'stop_reason': STOP_REASONS[int(stop_reasons[i])],
+            'compile_mode': state['compile_mode']
+        })
+        result.update({name: float(columns[name][i]) for name in INPUT_NAMES})
+        results.append(result)
+    
+    return results
+
+def pareto_mask(objectives: np.ndarray) -> np.ndarray:
+    """
+    Xác định các điểm không bị trội (mọi mục tiêu đều cần cực tiểu hóa)
+    
+    Args:
+        objectives: Mảng (số điểm, số mục tiêu)
+        
+    Returns:
+        Mảng bool đánh dấu các điểm thuộc biên Pareto
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    # Điểm j trội hơn điểm i nếu không tệ hơn ở mọi mục tiêu và tốt hơn ở ít nhất một mục tiêu
+    no_worse = (objectives[None, :, :] <= objectives[:, None, :]).all(axis=2)
+    better = (objectives[None, :, :] < objectives[:, None, :]).any(axis=2)
+    return ~(no_worse & better).any(axis=1)
+
+def optimize_pareto_front(
+    H: float,
+    gamma_bt: float = 2.4,
+    gamma_n: float = 1.0,
+    f: float = 0.7,
+    C: float = 0.5,
+    Kc: float = 1.2,
+    a1: float = 0.6,
+    alphas: Any = (0.01,),
+    k_factors: Any = tuple(np.linspace(0.8, 1.6, 100)),
+    epochs: int = 5000,
+    device: Optional[str] = None,
+    verbose: bool = True,
+    early_stopping: Optional[EarlyStopping] = None,
+    compiled: bool = False
+) -> Dict:
+    """
+    Tính biên Pareto giữa diện tích và mức độ an toàn trong một lần huấn luyện theo lô
+    
+    Mỗi tổ hợp (alpha, k_factor) trong tích Descartes của alphas và k_factors là một phần tử
+    của lô BatchedOptimalParamsNet, với alpha và k_factor là tensor theo lô trong loss_function.
+    Chi phí vì vậy gần bằng một lần chạy optimize_dam_section thay vì một lần cho mỗi tổ hợp.
+    
+    Args:
+        H, gamma_bt, gamma_n, f, C, Kc, a1: Thông số đầu vào như optimize_dam_section
+        alphas: Các giá trị hệ số phạt diện tích
+        k_factors: Các giá trị hệ số nhân cho Kc
+        epochs: Số vòng lặp tối đa
+        device: Thiết bị tính toán (CPU/GPU)
+        verbose: Hiển thị thông tin trong quá trình tính toán
+        early_stopping: Tiêu chí dừng sớm, áp dụng riêng cho từng tổ hợp
+        compiled: Dùng hàm vật lý + mất mát đã biên dịch (xem optimize_dam_section)
+        
+    Returns:
+        Dict gồm points (mọi tổ hợp, kèm cờ pareto), front (các điểm không bị trội theo
+        A nhỏ, K lớn, σ nhỏ, sắp xếp theo K), thời gian tính toán và các thông số đầu vào
+    """
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    
+    settings = np.array([(a, k) for a in np.atleast_1d(alphas) for k in np.atleast_1d(k_factors)], dtype=float)
+    batch_size = len(settings)
+    inputs = {'H': H, 'gamma_bt': gamma_bt, 'gamma_n': gamma_n, 'f': f, 'C': C, 'Kc': Kc, 'a1': a1}
+    
+    model = BatchedOptimalParamsNet(batch_size).to(device)
+    data = torch.ones((batch_size, 1), device=device)
+    alpha = torch.tensor(settings[:, 0], dtype=torch.float32, device=device)
+    k_factor = torch.tensor(settings[:, 1], dtype=torch.float32, device=device)
+    
+    start_time = time.time()
+    state = _train_params(model, data, inputs, alpha, k_factor, epochs, verbose,
+                          early_stopping=early_stopping, compiled=compiled)
+    elapsed_time = time.time() - start_time
+    
+    outputs = {key: state[key].cpu().numpy() for key in ('n', 'm', 'xi', 'A', 'K', 'sigma')}
+    on_front = pareto_mask(np.stack([outputs['A'], -outputs['K'], outputs['sigma']], axis=1))
+    stopped_epochs = state['stopped_epoch'].numpy()
+    
+    points = []
+    for i in range(batch_size):
+        point = {key: float(outputs[key][i]) for key in outputs}
+        point.update({
+            'alpha': float(settings[i, 0]),
+            'k_factor': float(settings[i, 1]),
+            'stopped_epoch': int(stopped_epochs[i]),
+            'pareto': bool(on_front[i])
+        })
+        points.append(point)
+    
+    result = {
+        'points': points,
+        'front': sorted((point for point in points if point['pareto']), key=lambda point: point['K']),
+        'computation_time': elapsed_time,
+        'batch_size': batch_size
+    }
+    result.update(inputs)
+    return result
+
+def benchmark_compiled(
+    H: float = 60.0,
+    batch_size: int = 1,
+    epochs: int = 500,
+    device: Optional[str] = None
+) -> Dict:
+    """
+    Đo tốc độ huấn luyện (vòng lặp/giây) của chế độ thường và chế độ biên dịch
+    
+    Args:
+        H: Chiều cao đập (m) dùng cho mọi kịch bản
+        batch_size: Số kịch bản huấn luyện đồng thời
+        epochs: Số vòng lặp đo cho mỗi chế độ (không tính lần chạy khởi động)
+        device: Thiết bị tính toán (CPU/GPU)
+        
+    Returns:
+        Dict: Tốc độ eager_eps, compiled_eps, hệ số tăng tốc (speedup) và chế độ biên dịch đã dùng
+    """
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    
+    scenarios = [{'H': H}] * batch_size
+    rates = {}
+    modes = {}
+    for compiled in (False, True):
+        # Lần chạy ngắn đầu tiên để loại bỏ thời gian biên dịch/khởi động
+        optimize_dam_sections(scenarios, epochs=10, device=device, verbose=False, compiled=compiled)
+        start_time = time.time()
+        results = optimize_dam_sections(scenarios, epochs=epochs, device=device, verbose=False, compiled=compiled)
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        rates[compiled] = epochs / (time.time() - start_time)
+        modes[compiled] = results[0]['compile_mode']
+    
+    return {
+        'eager_eps': rates[False],
+        'compiled_eps': rates[True],
+        'speedup': rates[True] / rates[False],
+        'compile_mode': modes[True],
+        'batch_size': batch_size,
+        'device': device
+    }
+
+def train_surrogate(
+    epochs: int = 20000,
+    batch_size: int = 512,
+    alpha: float = 0.01,
+    k_factor: float = 1.0,
+    hidden: int = 128,
+    lr: float = 1e-3,
+    save_path: Optional[str] = DEFAULT_SURROGATE_PATH,
+    device: Optional[str] = None,
+    seed: Optional[int] = None,
+    verbose: bool = True
+) -> ParametricParamsNet:
+    """
+    Huấn luyện mạng thay thế trên toàn miền INPUT_BOUNDS
+    
+    Mỗi vòng lặp lấy ngẫu nhiên một lô thông số đầu vào trong miền cho phép và tối thiểu hóa
+    hàm mất mát vật lý của từng kịch bản. Mất mát được chia cho (H / 60)² để các đập cao không
+    lấn át các đập thấp; cách chia theo từng kịch bản này không làm thay đổi nghiệm tối ưu.
+    
+    Args:
+        epochs: Số vòng lặp huấn luyện
+        batch_size: Số kịch bản lấy mẫu ở mỗi vòng lặp
+        alpha: Hệ số phạt diện tích
+        k_factor: Hệ số nhân cho Kc
+        hidden: Số nơ-ron ở mỗi lớp ẩn
+        lr: Tốc độ học
+        save_path: Đường dẫn lưu mô hình (nếu None, không lưu)
+        device: Thiết bị tính toán (CPU/GPU)
+        seed: Hạt giống ngẫu nhiên
+        verbose: Hiển thị thông tin trong quá trình huấn luyện
+        
+    Returns:
+        Mô hình ParametricParamsNet đã huấn luyện
+    """
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    
+    generator = torch.Generator(device="cpu")
+    if seed is not None:
+        torch.manual_seed(seed)
+        generator.manual_seed(seed)
+    
+    model = ParametricParamsNet(hidden).to(device)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(epochs, 1), eta_min=lr * 0.01)
+    
+    lows = torch.tensor([INPUT_BOUNDS[name][0] for name in INPUT_NAMES])
+    spans = torch.tensor([INPUT_BOUNDS[name][1] - INPUT_BOUNDS[name][0] for name in INPUT_NAMES])
+    
+    model.train()
     for epoch in range(epochs):
+        # Lấy mẫu đều trong miền thông số đầu vào
+        unit = torch.rand((batch_size, len(INPUT_NAMES)), generator=generator)
+        x = (2 * unit - 1).to(device)
+        values = (lows + unit * spans).to(device)
+        inputs = {name: values[:, i] for i, name in enumerate(INPUT_NAMES)}
+        
         optimizer.zero_grad()
-        n, m, xi = model(data)
-        sigma, K, A = compute_physics(n, xi, m, H, gamma_bt, gamma_n, f, C, a1)
-        loss = loss_function(sigma, K, A, Kc, k_factor, alpha)
+        n, m, xi = model(x)
+        sigma, K, A = compute_physics(n, xi, m, inputs['H'], inputs['gamma_bt'], inputs['gamma_n'],
+                                      inputs['f'], inputs['C'], inputs['a1'])
+        row_loss = loss_function(sigma, K, A, inputs['Kc'], k_factor, alpha, reduction='none')
+        loss = (row_loss * (60.0 / inputs['H'])**2).mean()
         loss.backward()
         optimizer.step()
-        loss_history.append(loss.item())
+        scheduler.step()
         
-        if verbose and epoch % 500 == 0:
+        if verbose and epoch % 1000 == 0:
             print(f"Epoch {epoch}: Loss = {loss.item():.6f}")
     
-    # Tính toán kết quả cuối cùng
     model.eval()
-    with torch.no_grad():
-        n, m, xi = model(data)
-        sigma, K, A = compute_physics(n, xi, m, H, gamma_bt, gamma_n, f, C, a1)
+    model.alpha = alpha
+    model.k_factor = k_factor
     
-    # Chuyển đổi kết quả sang numpy
-    n_value = n.item()
-    m_value = m.item()
-    xi_value = xi.item()
-    sigma_value = sigma.item()
-    K_value = K.item()
-    A_value = A.item()
+    if save_path:
+        save_surrogate(model, save_path)
+    
+    return model
+
+def save_surrogate(model: ParametricParamsNet, path: str = DEFAULT_SURROGATE_PATH) -> None:
+    """
+    Lưu mạng thay thế cùng các siêu tham số đã dùng để huấn luyện
+    
+    Args:
+        model: Mô hình ParametricParamsNet
+        path: Đường dẫn file lưu mô hình
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    torch.save({
+        'state_dict': model.state_dict(),
+        'hidden': model.hidden,
+        'alpha': getattr(model, 'alpha', 0.01),
+        'k_factor': getattr(model, 'k_factor', 1.0),
+        'input_bounds': INPUT_BOUNDS
+    }, path)
+
+def load_surrogate(path: str = DEFAULT_SURROGATE_PATH, device: Optional[str] = None) -> Optional[ParametricParamsNet]:
+    """
+    Tải mạng thay thế đã lưu
+    
+    Args:
+        path: Đường dẫn file lưu mô hình
+        device: Thiết bị tính toán (CPU/GPU)
+        
+    Returns:
+        Mô hình ParametricParamsNet hoặc None nếu file không tồn tại
+    """
+    if not os.path.exists(path):
+        return None
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    
+    checkpoint = torch.load(path, map_location=device)
+    if checkpoint.get('input_bounds', INPUT_BOUNDS) != INPUT_BOUNDS:
+        raise ValueError("Mô hình thay thế được huấn luyện với miền thông số khác INPUT_BOUNDS")
+    
+    model = ParametricParamsNet(checkpoint['hidden']).to(device)
+    model.load_state_dict(checkpoint['state_dict'])
+    model.alpha = checkpoint['alpha']
+    model.k_factor = checkpoint['k_factor']
+    model.eval()
+    return model
+
+def surrogate_optimize(
+    model: ParametricParamsNet,
+    H: float,
+    gamma_bt: float = 2.4,
+    gamma_n: float = 1.0,
+    f: float = 0.7,
+    C: float = 0.5,
+    Kc: float = 1.2,
+    a1: float = 0.6,
+    fine_tune_epochs: int = 0,
+    lr: float = 1e-4,
+    verbose: bool = False
+) -> Dict:
+    """
+    Tính toán mặt cắt tối ưu bằng mạng thay thế, có thể tinh chỉnh thêm cho trường hợp cụ thể
+    
+    Args:
+        model: Mô hình ParametricParamsNet đã huấn luyện
+        H, gamma_bt, gamma_n, f, C, Kc, a1: Thông số đầu vào như optimize_dam_section
+        fine_tune_epochs: Số vòng lặp tinh chỉnh trên bản sao của mô hình (0: chỉ lan truyền thuận)
+        lr: Tốc độ học khi tinh chỉnh
+        verbose: Hiển thị thông tin trong quá trình tinh chỉnh
+        
+    Returns:
+        Dict: Kết quả tính toán cùng cấu trúc với optimize_dam_section
+    """
+    import copy
+    
+    device = next(model.parameters()).device
+    inputs = {'H': H, 'gamma_bt': gamma_bt, 'gamma_n': gamma_n, 'f': f, 'C': C, 'Kc': Kc, 'a1': a1}
+    data = normalize_inputs(inputs, device=device)
+    alpha = getattr(model, 'alpha', 0.01)
+    k_factor = getattr(model, 'k_factor', 1.0)
+    
+    start_time = time.time()
+    
+    if fine_tune_epochs > 0:
+        # Tinh chỉnh trên bản sao để không làm thay đổi mô hình dùng chung
+        tuned = copy.deepcopy(model)
+        tuned.train()
+        state = _train_params(tuned, data, inputs, alpha, k_factor, fine_tune_epochs, verbose, lr=lr)
+        loss_history = state['loss_history'][:, 0].tolist()
+    else:
+        with torch.no_grad():
+            n, m, xi = model(data)
+            sigma, K, A = compute_physics(n, xi, m, H, gamma_bt, gamma_n, f, C, a1)
+            loss = loss_function(sigma, K, A, Kc, k_factor, alpha)
+        state = {'n': n, 'm': m, 'xi': xi, 'sigma': sigma, 'K': K, 'A': A}
+        loss_history = [loss.item()]
     
-    # Tính toán thời gian
     elapsed_time = time.time() - start_time
     
-    # Trả về kết quả
     return {
-        'n': n_value,
-        'm': m_value,
-        'xi': xi_value,
-        'A': A_value,
-        'K': K_value,
-        'sigma': sigma_value,
+        'n': state['n'].item(),
+        'm': state['m'].item(),
+        'xi': state['xi'].item(),
+        'A': state['A'].item(),
+        'K': state['K'].item(),
+        'sigma': state['sigma'].item(),
         'loss_history': loss_history,
         'computation_time': elapsed_time,
         'H': H,
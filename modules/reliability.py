@@ -0,0 +1,174 @@
+"""
+Mô-đun phân tích độ tin cậy của mặt cắt đập bằng phương pháp Monte Carlo
+"""
+
+import numpy as np
+import time
+from statistics import NormalDist
+from typing import Any, Dict, Optional, Tuple, Union
+
+from modules.numpy_engine import compute_physics_np
+
+# Các thông số đầu vào có thể khai báo là ngẫu nhiên
+UNCERTAIN_INPUTS = ('gamma_bt', 'gamma_n', 'f', 'C', 'a1')
+
+DISTRIBUTIONS = ('normal', 'lognormal', 'uniform')
+
+# Hệ số biến thiên mặc định (độ lệch chuẩn / giá trị trung bình)
+DEFAULT_COV = {
+    'gamma_bt': 0.03,
+    'f': 0.10,
+    'C': 0.20,
+    'a1': 0.10
+}
+
+def default_distributions(result: Dict[str, Any], cov: Optional[Dict[str, float]] = None) -> Dict[str, Tuple]:
+    """
+    Tạo phân phối mặc định quanh các giá trị thiết kế của một kết quả tính toán
+    
+    gamma_bt, f và a1 có phân phối chuẩn; C có phân phối loga chuẩn (luôn dương).
+    
+    Args:
+        result: Kết quả tính toán (cần các khóa gamma_bt, f, C, a1)
+        cov: Hệ số biến thiên của từng thông số (nếu None, dùng DEFAULT_COV)
+    
+    Returns:
+        Dict ánh xạ tên thông số sang (loại phân phối, tham số 1, tham số 2)
+    """
+    cov = DEFAULT_COV if cov is None else cov
+    distributions = {}
+    for name, ratio in cov.items():
+        mean = float(result[name])
+        if mean == 0 or ratio == 0:
+            continue
+        kind = 'lognormal' if name == 'C' else 'normal'
+        distributions[name] = (kind, mean, abs(mean) * ratio)
+    return distributions
+
+def _sample(spec: Union[float, Tuple], size: int, rng: np.random.Generator) -> Union[float, np.ndarray]:
+    """
+    Lấy mẫu một thông số theo mô tả phân phối
+    
+    Args:
+        spec: Số thực (tất định) hoặc tuple ('normal', trung bình, độ lệch chuẩn),
+            ('lognormal', trung bình, độ lệch chuẩn) hoặc ('uniform', cận dưới, cận trên)
+        size: Số mẫu
+        rng: Bộ sinh số ngẫu nhiên
+    """
+    if not isinstance(spec, (tuple, list)):
+        return float(spec)
+    
+    kind, a, b = spec
+    if kind == 'normal':
+        return rng.normal(a, b, size)
+    if kind == 'lognormal':
+        # Tham số của ln(X) từ trung bình và độ lệch chuẩn của X
+        s2 = np.log1p((b / a)**2)
+        return rng.lognormal(np.log(a) - 0.5 * s2, np.sqrt(s2), size)
+    if kind == 'uniform':
+        return rng.uniform(a, b, size)
+    raise ValueError(f"Phân phối không hợp lệ: {kind} (chọn một trong {DISTRIBUTIONS})")
+
+def wilson_interval(failures: int, samples: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """
+    Khoảng tin cậy Wilson cho xác suất nhị thức (dùng được cả khi chưa quan sát thấy phá hoại)
+    
+    Args:
+        failures: Số lần phá hoại
+        samples: Tổng số mẫu
+        confidence: Mức tin cậy
+    
+    Returns:
+        Tuple (cận dưới, cận trên)
+    """
+    if samples == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = failures / samples
+    denominator = 1 + z**2 / samples
+    center = (p + z**2 / (2 * samples)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / samples + z**2 / (4 * samples**2)) / denominator
+    return max(float(center - half_width), 0.0), min(float(center + half_width), 1.0)
+
+def reliability_analysis(
+    result: Dict[str, Any],
+    distributions: Optional[Dict[str, Union[float, Tuple]]] = None,
+    n_samples: int = 1_000_000,
+    chunk_size: int = 250_000,
+    k_factor: float = 1.0,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+    verbose: bool = False
+) -> Dict[str, Any]:
+    """
+    Ước lượng xác suất mất ổn định của một mặt cắt đã tối ưu khi các thông số vật liệu là ngẫu nhiên
+    
+    Các mẫu được sinh và đánh giá theo từng lô `chunk_size` bằng compute_physics_np, chỉ giữ lại
+    số lần phá hoại cộng dồn, nên bộ nhớ không phụ thuộc vào số mẫu. Sau mỗi lô, ước lượng hiện
+    tại được ghi vào lịch sử hội tụ.
+    
+    Args:
+        result: Kết quả tính toán (n, m, xi và các thông số đầu vào H, gamma_bt, gamma_n, f, C, Kc, a1)
+        distributions: Phân phối của các thông số trong UNCERTAIN_INPUTS (xem _sample);
+            thông số không khai báo giữ giá trị thiết kế. Nếu None, dùng default_distributions
+        n_samples: Tổng số mẫu
+        chunk_size: Số mẫu trong một lô
+        k_factor: Hệ số nhân cho Kc
+        confidence: Mức tin cậy của khoảng tin cậy
+        seed: Hạt giống ngẫu nhiên (để tái lập kết quả)
+        verbose: Hiển thị tiến trình
+    
+    Returns:
+        Dict gồm xác suất trượt P(K < Kc·k_factor), xác suất kéo P(σ > 0), xác suất phá hoại
+        (một trong hai), khoảng tin cậy, hệ số biến thiên của ước lượng và lịch sử hội tụ
+    """
+    if distributions is None:
+        distributions = default_distributions(result)
+    unknown = set(distributions) - set(UNCERTAIN_INPUTS)
+    if unknown:
+        raise ValueError(f"Không hỗ trợ thông số ngẫu nhiên: {sorted(unknown)}")
+    
+    start_time = time.time()
+    rng = np.random.default_rng(seed)
+    K_min = result['Kc'] * k_factor
+    specs = {name: distributions.get(name, result[name]) for name in UNCERTAIN_INPUTS}
+    
+    counts = {'sliding': 0, 'tension': 0, 'failure': 0}
+    history = {'samples': [], 'sliding': [], 'tension': [], 'failure': []}
+    done = 0
+    while done < n_samples:
+        size = min(chunk_size, n_samples - done)
+        values = {name: _sample(spec, size, rng) for name, spec in specs.items()}
+        sigma, K, _ = compute_physics_np(result['n'], result['xi'], result['m'], result['H'],
+                                         values['gamma_bt'], values['gamma_n'], values['f'],
+                                         values['C'], values['a1'])
+        sliding = np.broadcast_to(K < K_min, (size,))
+        tension = np.broadcast_to(sigma > 0, (size,))
+        counts['sliding'] += int(np.count_nonzero(sliding))
+        counts['tension'] += int(np.count_nonzero(tension))
+        counts['failure'] += int(np.count_nonzero(sliding | tension))
+        done += size
+        
+        history['samples'].append(done)
+        for key in counts:
+            history[key].append(counts[key] / done)
+        if verbose:
+            print(f"{done} mẫu: P(trượt) = {counts['sliding'] / done:.3e}, P(kéo) = {counts['tension'] / done:.3e}")
+    
+    elapsed_time = time.time() - start_time
+    
+    output = {
+        'n_samples': done,
+        'confidence': confidence,
+        'distributions': specs,
+        'history': {key: np.array(values) for key, values in history.items()},
+        'computation_time': elapsed_time,
+        'samples_per_second': done / elapsed_time if elapsed_time > 0 else float('inf')
+    }
+    for key, failures in counts.items():
+        p = failures / done
+        output[f'p_{key}'] = p
+        output[f'ci_{key}'] = wilson_interval(failures, done, confidence)
+        # Hệ số biến thiên của ước lượng Monte Carlo: sqrt((1 - p) / (N p))
+        output[f'cov_{key}'] = float(np.sqrt((1 - p) / (done * p))) if failures > 0 else float('inf')
+    return output
@@ -3,7 +3,6 @@ Mô-đun tạo báo cáo cho ứng dụng tính toán tối ưu mặt cắt đ
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import io
 import base64
 from typing import Dict, Any, Optional
@@ -11,19 +10,24 @@ from fpdf import FPDF
 import os
 import tempfile
 
+from modules.visualization import LOSS_CURVE_POINTS, downsample_loss
+
 class ReportGenerator:
     """
     Lớp tạo báo cáo PDF và Excel cho kết quả tính toán
     """
     
     @staticmethod
-    def create_excel_report(result: Dict[str, Any], output_path: Optional[str] = None) -> pd.DataFrame:
+    def create_excel_report(result: Dict[str, Any], output_path: Optional[str] = None,
+                            max_points: Optional[int] = LOSS_CURVE_POINTS) -> pd.DataFrame:
         """
         Tạo báo cáo Excel từ kết quả tính toán
         
         Args:
             result: Kết quả tính toán từ mô-đun PINNs
             output_path: Đường dẫn để lưu file Excel (nếu None, không lưu)
+            max_points: Số điểm tối đa của lịch sử hàm mất mát ghi vào sheet Loss và biểu đồ
+                (xem downsample_loss; nếu None, ghi mọi epoch)
             
         Returns:
             DataFrame chứa dữ liệu báo cáo
@@ -78,21 +82,22 @@ class ReportGenerator:
                 worksheet.set_column('A:A', 30, format1)
                 worksheet.set_column('B:B', 20, format1)
                 
-                # Thêm biểu đồ hàm mất mát
-                loss_chart = workbook.add_chart({'type': 'line'})
+                # Thêm biểu đồ hàm mất mát (dạng scatter để trục epoch đúng tỉ lệ khi đã giảm điểm)
+                loss_chart = workbook.add_chart({'type': 'scatter', 'subtype': 'straight'})
                 
                 # Thêm sheet cho dữ liệu hàm mất mát
+                epochs, values = downsample_loss(result['loss_history'], max_points)
                 loss_df = pd.DataFrame({
-                    'Epoch': range(len(result['loss_history'])),
-                    'Loss': result['loss_history']
+                    'Epoch': epochs,
+                    'Loss': values
                 })
                 loss_df.to_excel(writer, sheet_name='Loss', index=False)
                 
                 # Cấu hình biểu đồ
                 loss_chart.add_series({
                     'name': 'Hàm mất mát',
-                    'categories': '=Loss!$A$2:$A$' + str(len(result['loss_history']) + 1),
-                    'values': '=Loss!$B$2:$B$' + str(len(result['loss_history']) + 1),
+                    'categories': '=Loss!$A$2:$A$' + str(len(loss_df) + 1),
+                    'values': '=Loss!$B$2:$B$' + str(len(loss_df) + 1),
                     'line': {'color': 'blue', 'width': 1.5}
                 })
                 
@@ -118,22 +123,20 @@ class ReportGenerator:
         Returns:
             Đường dẫn đến file PDF đã tạo hoặc chuỗi rỗng nếu không lưu
         """
-        from modules.visualization import create_force_diagram, plot_loss_curve
+        from modules.visualization import force_diagram_png, loss_curve_png
         
         # Tạo thư mục tạm để lưu hình ảnh
         temp_dir = tempfile.mkdtemp()
         
-        # Tạo hình ảnh mặt cắt đập
-        dam_fig = create_force_diagram(result, interactive=False)
+        # Tạo hình ảnh mặt cắt đập (dùng lại ảnh đã vẽ nếu có trong bộ nhớ đệm hình)
         dam_img_path = os.path.join(temp_dir, 'dam_section.png')
-        dam_fig.savefig(dam_img_path, dpi=150, bbox_inches='tight')
-        plt.close(dam_fig)
+        with open(dam_img_path, 'wb') as f:
+            f.write(force_diagram_png(result, dpi=150, tight=True))
         
         # Tạo biểu đồ hàm mất mát
-        loss_fig = plot_loss_curve(result['loss_history'], interactive=False)
         loss_img_path = os.path.join(temp_dir, 'loss_curve.png')
-        loss_fig.savefig(loss_img_path, dpi=150, bbox_inches='tight')
-        plt.close(loss_fig)
+        with open(loss_img_path, 'wb') as f:
+            f.write(loss_curve_png(result['loss_history'], dpi=150, tight=True))
         
         # Tạo PDF
         pdf = FPDF()
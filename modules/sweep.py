@@ -0,0 +1,145 @@
+"""
+Mô-đun chạy khảo sát tham số (sweep) trên nhiều lõi CPU
+"""
+
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from modules.numpy_engine import DEFAULT_INPUTS, INPUT_NAMES, scenario_columns
+
+def build_grid(**axes: Sequence[float]) -> List[Dict[str, float]]:
+    """
+    Tạo lưới Descartes các kịch bản từ danh sách giá trị của từng thông số
+    
+    Ví dụ: build_grid(H=[40, 60, 80], f=[0.6, 0.7]) tạo 6 kịch bản; các thông số không được
+    liệt kê dùng giá trị mặc định.
+    
+    Args:
+        axes: Tên thông số (H, gamma_bt, gamma_n, f, C, Kc, a1) và danh sách giá trị
+    
+    Returns:
+        List[Dict]: Các kịch bản đầy đủ 7 thông số
+    """
+    unknown = set(axes) - set(INPUT_NAMES)
+    if unknown:
+        raise ValueError(f"Thông số không hợp lệ: {sorted(unknown)}")
+    if 'H' not in axes:
+        raise ValueError("Lưới khảo sát phải có trục H")
+    
+    names = list(axes)
+    scenarios = []
+    for values in itertools.product(*(axes[name] for name in names)):
+        scenario = dict(DEFAULT_INPUTS)
+        scenario.update({name: float(value) for name, value in zip(names, values)})
+        scenarios.append({name: scenario[name] for name in INPUT_NAMES})
+    return scenarios
+
+def scenario_key(scenario: Dict[str, Any], decimals: int = 6) -> tuple:
+    """Khóa so sánh của một kịch bản: bộ 7 thông số đầu vào đã làm tròn"""
+    return tuple(round(float(scenario[name]), decimals) for name in INPUT_NAMES)
+
+def _init_worker(threads: int, engine: str = 'pinn') -> None:
+    """Giới hạn số luồng PyTorch của tiến trình con để các tiến trình không tranh chấp lõi"""
+    if engine != 'pinn':
+        # Các bộ giải 'numpy' và 'grid' không dùng PyTorch: không nhập torch trong tiến trình con
+        return
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Chỉ được đặt trước khi PyTorch khởi chạy tác vụ song song đầu tiên
+        pass
+
+def _run_chunk(scenarios: List[Dict[str, float]], options: Dict[str, Any]) -> List[Dict]:
+    """Tính một nhóm kịch bản trong tiến trình con"""
+    engine = options.get('engine', 'pinn')
+    if engine == 'numpy':
+        from modules.numpy_engine import optimize_sections_np
+        # Cùng giá trị mặc định với optimize_dam_sections; các tùy chọn riêng của bộ giải 'pinn' bị bỏ qua
+        return optimize_sections_np(scenarios, alpha=options.get('alpha', 0.01), k_factor=options.get('k_factor', 1.0),
+                                    epochs=options.get('epochs', 5000))
+    if engine == 'grid':
+        from modules.global_search import global_search
+        return [global_search(*(scenario[name] for name in INPUT_NAMES), k_factor=options.get('k_factor', 1.0))
+                for scenario in scenarios]
+    from modules.pinns_model import optimize_dam_sections
+    return optimize_dam_sections(scenarios, **{**options, 'verbose': False})
+
+def run_sweep(
+    scenarios: Any,
+    workers: Optional[int] = None,
+    threads_per_worker: int = 1,
+    chunk_size: int = 1,
+    db: Optional[Any] = None,
+    db_batch: int = 20,
+    resume: bool = True,
+    **options: Any
+) -> Iterator[Dict]:
+    """
+    Chạy khảo sát tham số trên một nhóm tiến trình, trả về kết quả ngay khi từng nhóm hoàn thành
+    
+    Mỗi tác vụ gọi optimize_dam_sections cho `chunk_size` kịch bản (các kịch bản trong một nhóm
+    được huấn luyện đồng thời như một lô). Kết quả được trả về theo thứ tự hoàn thành, không
+    theo thứ tự đầu vào; mỗi kết quả chứa đủ 7 thông số đầu vào để đối chiếu.
+    
+    Args:
+        scenarios: DataFrame, dict các mảng hoặc list các dict (xem optimize_dam_sections),
+            ví dụ kết quả của build_grid
+        workers: Số tiến trình (nếu None, số lõi CPU chia cho threads_per_worker)
+        threads_per_worker: Số luồng PyTorch của mỗi tiến trình (bộ giải 'pinn'); với bộ giải
+            'numpy' hoặc 'grid', tiến trình con không nhập PyTorch
+        chunk_size: Số kịch bản trong một tác vụ
+        db: DamDatabase để lưu kết quả (nếu None, không lưu)
+        db_batch: Số kết quả được gom lại trước mỗi lần ghi vào cơ sở dữ liệu
+        resume: Bỏ qua các kịch bản đã có kết quả trong db (so khớp theo 7 thông số đầu vào,
+            không phân biệt bộ giải hay alpha/k_factor)
+        options: Các tham số khác truyền cho optimize_dam_sections (epochs, alpha, k_factor,
+            early_stopping, engine, compiled, ...)
+    
+    Yields:
+        Dict: Kết quả của từng kịch bản
+    """
+    columns = scenario_columns(scenarios)
+    pending = [{name: float(columns[name][i]) for name in INPUT_NAMES} for i in range(len(columns['H']))]
+    
+    if db is not None and resume:
+        stored = db.get_stored_inputs()
+        pending = [scenario for scenario in pending if scenario_key(scenario) not in stored]
+    if not pending:
+        return
+    
+    if workers is None:
+        workers = max((os.cpu_count() or 1) // threads_per_worker, 1)
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    
+    # 'spawn' tránh treo tiến trình con khi fork một tiến trình đã khởi tạo nhóm luồng OpenMP
+    executor = ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(threads_per_worker, options.get('engine', 'pinn'))
+    )
+    buffer = []
+    try:
+        futures = [executor.submit(_run_chunk, chunk, options) for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                if db is not None:
+                    buffer.append(result)
+                    if len(buffer) >= db_batch:
+                        _flush(db, buffer)
+                yield result
+    finally:
+        # Lưu các kết quả đã có kể cả khi bị ngắt giữa chừng, để lần chạy sau có thể tiếp tục
+        if db is not None:
+            _flush(db, buffer)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _flush(db: Any, buffer: List[Dict]) -> None:
+    """Ghi các kết quả đang chờ vào cơ sở dữ liệu (một giao dịch) và làm rỗng bộ đệm"""
+    db.save_results_many(buffer)
+    buffer.clear()
@@ -7,9 +7,141 @@ import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from matplotlib.patches import FancyArrow
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Dict, List, Tuple, Optional, Any, Callable, Hashable
 import io
 import base64
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+class RenderCache:
+    """
+    Bộ nhớ đệm LRU cho các hình đã vẽ
+    
+    Mỗi mục là JSON của biểu đồ Plotly hoặc ảnh PNG (bytes), nên mục lưu trữ không bị thay đổi
+    bởi nơi dùng. Bộ nhớ đệm bị chặn theo cả số mục lẫn tổng kích thước; khi vượt giới hạn,
+    mục ít được dùng gần đây nhất bị loại trước.
+    """
+    def __init__(self, maxsize: int = 64, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            maxsize: Số hình tối đa
+            max_bytes: Tổng kích thước tối đa của các hình (byte)
+        """
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Hình đã lưu theo khóa, None nếu chưa có"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Lưu một hình (str hoặc bytes), loại các hình cũ nhất nếu vượt giới hạn"""
+        size = len(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            if size > self.max_bytes:
+                # Hình lớn hơn toàn bộ bộ nhớ đệm: không lưu
+                return
+            self._entries[key] = value
+            self._bytes += size
+            while len(self._entries) > self.maxsize or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Any]) -> Any:
+        """
+        Lấy hình theo khóa, vẽ và lưu lại nếu chưa có
+        
+        Args:
+            key: Khóa của hình (xem force_diagram_key, loss_curve_key)
+            render: Hàm vẽ, trả về JSON (str) hoặc PNG (bytes)
+        
+        Returns:
+            Hình đã lưu hoặc vừa vẽ
+        """
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Xóa mọi hình đã lưu (giữ nguyên số liệu thống kê)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Số lần trúng, trượt, số hình bị loại, tỉ lệ trúng, số hình và tổng kích thước đang lưu"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'bytes': self._bytes
+            }
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+def get_render_cache() -> RenderCache:
+    """Bộ nhớ đệm hình dùng chung của tiến trình (khởi tạo ở lần gọi đầu tiên)"""
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            _render_cache = RenderCache()
+        return _render_cache
+
+def loss_digest(loss_history: List[float]) -> str:
+    """Mã băm của lịch sử hàm mất mát (dùng làm khóa thay cho cả chuỗi giá trị)"""
+    values = np.ascontiguousarray(loss_history, dtype=np.float64)
+    return hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest()
+
+def force_diagram_key(result: Dict[str, Any], kind: str, dpi: Optional[int] = None) -> tuple:
+    """Khóa của sơ đồ lực: hình chỉ phụ thuộc H, n, m, xi, dạng hình và độ phân giải"""
+    return ('force', float(result['H']), float(result['n']), float(result['m']), float(result['xi']), kind, dpi)
+
+def loss_curve_key(loss_history: List[float], kind: str, dpi: Optional[int] = None,
+                   max_points: Optional[int] = None, epoch_range: Optional[Tuple[int, int]] = None) -> tuple:
+    """Khóa của biểu đồ hàm mất mát theo mã băm lịch sử, dạng hình, độ phân giải và cách giảm điểm"""
+    if epoch_range is not None:
+        epoch_range = (int(epoch_range[0]), int(epoch_range[1]))
+    return ('loss', loss_digest(loss_history), kind, dpi, max_points, epoch_range)
+
+def figure_to_png(fig: Any, dpi: int = 100, tight: bool = False) -> bytes:
+    """Lưu một Matplotlib Figure thành ảnh PNG rồi đóng figure"""
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight' if tight else None)
+    finally:
+        # Đóng figure để tránh rò rỉ bộ nhớ
+        plt.close(fig)
+    return buf.getvalue()
+
+def _figure_from_json(payload: str) -> go.Figure:
+    # JSON được tạo từ một Figure hợp lệ nên bỏ qua bước kiểm tra thuộc tính (chiếm phần lớn
+    # thời gian dựng lại Figure)
+    return go.Figure(json.loads(payload), _validate=False)
 
 def create_force_diagram(result: Dict[str, Any], interactive: bool = False) -> Any:
     """
@@ -175,24 +307,99 @@ def create_force_diagram(result: Dict[str, Any], interactive: bool = False) -> A
         
         return fig
 
-def plot_loss_curve(loss_history: List[float], interactive: bool = False) -> Any:
+# Số điểm tối đa khi vẽ lịch sử hàm mất mát; đủ mịn cho độ rộng của một biểu đồ
+LOSS_CURVE_POINTS = 2000
+
+def downsample_loss(
+    loss_history: List[float],
+    max_points: Optional[int] = LOSS_CURVE_POINTS,
+    epoch_range: Optional[Tuple[int, int]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Giảm số điểm của lịch sử hàm mất mát bằng thuật toán LTTB (Largest-Triangle-Three-Buckets)
+    
+    Các epoch được chia thành max_points - 2 nhóm; ở mỗi nhóm giữ lại điểm tạo tam giác lớn nhất
+    với điểm vừa chọn ở nhóm trước và trung bình của nhóm sau, nên các bước nhảy và gai của
+    đường cong được giữ nguyên. Diện tích được tính theo log10(loss), khớp với trục logarit của
+    biểu đồ. Điểm đầu và điểm cuối luôn được giữ.
+    
+    Args:
+        loss_history: Lịch sử giá trị hàm mất mát
+        max_points: Số điểm tối đa, ít nhất 3 để có một nhóm giữa điểm đầu và điểm cuối
+            (nếu None, giữ mọi điểm)
+        epoch_range: Khoảng epoch (đầu, cuối) cần vẽ, gồm cả hai đầu (nếu None, toàn bộ lịch sử)
+    
+    Returns:
+        Tuple (epochs, values) của các điểm được giữ lại
+    
+    Raises:
+        ValueError: Nếu max_points nhỏ hơn 3
+    """
+    if max_points is not None and max_points < 3:
+        raise ValueError(f"Số điểm tối đa của đường cong mất mát phải ít nhất là 3: {max_points}")
+    values = np.asarray(loss_history, dtype=np.float64)
+    start, stop = (0, len(values)) if epoch_range is None else (max(int(epoch_range[0]), 0),
+                                                                min(int(epoch_range[1]) + 1, len(values)))
+    values = values[start:stop]
+    size = len(values)
+    if max_points is None or size <= max_points:
+        return np.arange(start, start + size), values
+    max_points = int(max_points)
+    
+    # Trục logarit: loss <= 0 được thay bằng giá trị dương nhỏ nhất để log10 xác định
+    y = np.log10(np.maximum(values, np.finfo(np.float64).tiny))
+    edges = np.linspace(1, size - 1, max_points - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    # Trọng tâm của từng nhóm, dùng làm đỉnh thứ ba của tam giác cho nhóm liền trước
+    centers_x = edges[:-1] + (sizes - 1) / 2
+    # Điểm cuối (chỉ số size - 1) không thuộc nhóm nào
+    centers_y = np.add.reduceat(y[:size - 1], edges[:-1]) / sizes
+    centers_x = np.append(centers_x[1:], size - 1)
+    centers_y = np.append(centers_y[1:], y[-1])
+    
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        # Hai lần diện tích tam giác (điểm trước, điểm ứng viên, trọng tâm nhóm sau)
+        area = np.abs((previous - centers_x[bucket]) * (y[lo:hi] - y[previous])
+                      - (previous - np.arange(lo, hi)) * (centers_y[bucket] - y[previous]))
+        previous = lo + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return start + selected, values[selected]
+
+def plot_loss_curve(
+    loss_history: List[float],
+    interactive: bool = False,
+    max_points: Optional[int] = LOSS_CURVE_POINTS,
+    epoch_range: Optional[Tuple[int, int]] = None
+) -> Any:
     """
     Vẽ biểu đồ hàm mất mát
     
+    Lịch sử dài được giảm xuống tối đa max_points điểm (xem downsample_loss), nên kích thước
+    biểu đồ và thời gian vẽ không tăng theo số epoch. Để xem chi tiết, thu hẹp epoch_range
+    (đủ hẹp thì mọi điểm trong khoảng đều được vẽ) hoặc đặt max_points=None.
+    
     Args:
         loss_history: Lịch sử giá trị hàm mất mát
         interactive: Nếu True, trả về biểu đồ Plotly tương tác, ngược lại trả về biểu đồ Matplotlib
+        max_points: Số điểm tối đa được vẽ (nếu None, vẽ mọi điểm)
+        epoch_range: Khoảng epoch (đầu, cuối) cần vẽ (nếu None, toàn bộ lịch sử)
         
     Returns:
         Đối tượng biểu đồ (Matplotlib Figure hoặc Plotly Figure)
     """
+    epochs, values = downsample_loss(loss_history, max_points, epoch_range)
+    
     if interactive:
         # Tạo biểu đồ Plotly tương tác
         fig = go.Figure()
         
         fig.add_trace(go.Scatter(
-            x=list(range(len(loss_history))),
-            y=loss_history,
+            x=epochs,
+            y=values,
             mode='lines',
             name='Loss',
             line=dict(color='royalblue', width=2)
@@ -224,7 +431,7 @@ def plot_loss_curve(loss_history: List[float], interactive: bool = False) -> Any
     else:
         # Tạo biểu đồ Matplotlib
         fig, ax = plt.subplots(figsize=(10, 6))
-        ax.plot(loss_history)
+        ax.plot(epochs, values)
         ax.set_xlabel("Epoch")
         ax.set_ylabel("Loss")
         ax.set_title("Hàm mất mát trong quá trình huấn luyện")
@@ -233,30 +440,241 @@ def plot_loss_curve(loss_history: List[float], interactive: bool = False) -> Any
         
         return fig
 
-def get_dam_section_image(result: Dict[str, Any]) -> str:
+def plot_sensitivity_tornado(sensitivity: Dict[str, Any], output: str = 'A', index: int = 0,
+                             relative_change: float = 0.1, interactive: bool = False) -> Any:
     """
-    Tạo hình ảnh mặt cắt đập và trả về dưới dạng base64 để hiển thị trong HTML
+    Vẽ biểu đồ lốc xoáy (tornado) độ nhạy của một đại lượng theo từng biến
+    
+    Mỗi thanh là thay đổi tuyến tính hóa của đại lượng khi một biến tăng/giảm `relative_change`
+    so với giá trị hiện tại, tính từ ma trận Jacobian; các biến được sắp xếp theo mức ảnh hưởng.
     
     Args:
-        result: Kết quả tính toán từ mô-đun PINNs
+        sensitivity: Kết quả của compute_sensitivities
+        output: Đại lượng cần vẽ ('A', 'K' hoặc 'sigma')
+        index: Thứ tự kết quả trong lô
+        relative_change: Mức thay đổi tương đối của biến (0.1 = ±10%)
+        interactive: Nếu True, trả về biểu đồ Plotly tương tác, ngược lại trả về biểu đồ Matplotlib
         
     Returns:
-        Chuỗi base64 của hình ảnh
+        Đối tượng biểu đồ (Matplotlib Figure hoặc Plotly Figure)
     """
-    fig = create_force_diagram(result, interactive=False)
+    row = list(sensitivity['outputs']).index(output)
+    variables = np.array(sensitivity['variables'])
+    delta = sensitivity['jacobian'][index, row] * sensitivity['inputs'][index] * relative_change
     
-    # Lưu hình ảnh vào buffer
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', dpi=100)
-    buf.seek(0)
+    # Sắp xếp tăng dần để biến ảnh hưởng nhất nằm trên cùng
+    order = np.argsort(np.abs(delta))
+    variables, delta = variables[order], delta[order]
+    percent = f"{relative_change * 100:g}%"
+    title = f"Độ nhạy của {output} khi các biến thay đổi ±{percent}"
+    
+    if interactive:
+        # Tạo biểu đồ Plotly tương tác
+        fig = go.Figure()
+        
+        fig.add_trace(go.Bar(
+            y=variables, x=-delta, orientation='h',
+            name=f"-{percent}", marker_color='indianred'
+        ))
+        fig.add_trace(go.Bar(
+            y=variables, x=delta, orientation='h',
+            name=f"+{percent}", marker_color='royalblue'
+        ))
+        
+        fig.update_layout(
+            title=title,
+            xaxis_title=f"Thay đổi của {output}",
+            barmode='overlay',
+            showlegend=True,
+            plot_bgcolor='white',
+            margin=dict(l=20, r=20, t=60, b=20),
+            xaxis=dict(
+                showgrid=True,
+                gridcolor='lightgray',
+                zeroline=True,
+                zerolinecolor='black'
+            )
+        )
+        
+        return fig
+    else:
+        # Tạo biểu đồ Matplotlib
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.barh(variables, -delta, color='indianred', label=f"-{percent}")
+        ax.barh(variables, delta, color='royalblue', label=f"+{percent}")
+        ax.axvline(0, color='black', linewidth=1)
+        ax.set_xlabel(f"Thay đổi của {output}")
+        ax.set_title(title)
+        ax.legend()
+        ax.grid(True, axis='x')
+        
+        return fig
+
+def plot_pareto_front(pareto: Dict[str, Any], interactive: bool = False) -> Any:
+    """
+    Vẽ biên Pareto giữa diện tích mặt cắt và hệ số ổn định
+    
+    Args:
+        pareto: Kết quả của optimize_pareto_front
+        interactive: Nếu True, trả về biểu đồ Plotly tương tác, ngược lại trả về biểu đồ Matplotlib
+        
+    Returns:
+        Đối tượng biểu đồ (Matplotlib Figure hoặc Plotly Figure)
+    """
+    points = pd.DataFrame(pareto['points'])
+    front = pd.DataFrame(pareto['front'])
+    dominated = points[~points['pareto']]
+    title = f"Biên Pareto diện tích - ổn định (H = {pareto['H']} m)"
     
-    # Chuyển đổi sang base64
-    img_str = base64.b64encode(buf.read()).decode('utf-8')
+    if interactive:
+        # Tạo biểu đồ Plotly tương tác
+        fig = go.Figure()
+        
+        fig.add_trace(go.Scatter(
+            x=dominated['K'], y=dominated['A'],
+            mode='markers',
+            name='Bị trội',
+            marker=dict(color='lightgray', size=6)
+        ))
+        fig.add_trace(go.Scatter(
+            x=front['K'], y=front['A'],
+            mode='lines+markers',
+            name='Biên Pareto',
+            marker=dict(color=front['sigma'], colorscale='RdBu_r', size=8,
+                        colorbar=dict(title='σ (T/m²)')),
+            line=dict(color='royalblue', width=1),
+            customdata=front[['n', 'm', 'xi', 'sigma', 'k_factor', 'alpha']].values,
+            hovertemplate=('K = %{x:.4f}<br>A = %{y:.2f} m²<br>n = %{customdata[0]:.4f}, '
+                           'm = %{customdata[1]:.4f}, ξ = %{customdata[2]:.4f}<br>'
+                           'σ = %{customdata[3]:.4f} T/m²<br>k_factor = %{customdata[4]:.3f}, '
+                           'alpha = %{customdata[5]:.3g}<extra></extra>')
+        ))
+        
+        fig.update_layout(
+            title=title,
+            xaxis_title='Hệ số ổn định K',
+            yaxis_title='Diện tích mặt cắt A (m²)',
+            showlegend=True,
+            plot_bgcolor='white',
+            margin=dict(l=20, r=20, t=60, b=20),
+            xaxis=dict(
+                showgrid=True,
+                gridcolor='lightgray',
+                showline=True,
+                linecolor='black'
+            ),
+            yaxis=dict(
+                showgrid=True,
+                gridcolor='lightgray',
+                showline=True,
+                linecolor='black'
+            )
+        )
+        
+        return fig
+    else:
+        # Tạo biểu đồ Matplotlib
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.scatter(dominated['K'], dominated['A'], color='lightgray', label='Bị trội')
+        ax.plot(front['K'], front['A'], color='royalblue', linewidth=1)
+        scatter = ax.scatter(front['K'], front['A'], c=front['sigma'], cmap='RdBu_r', label='Biên Pareto', zorder=3)
+        fig.colorbar(scatter, ax=ax, label='σ (T/m²)')
+        ax.set_xlabel("Hệ số ổn định K")
+        ax.set_ylabel("Diện tích mặt cắt A (m²)")
+        ax.set_title(title)
+        ax.legend()
+        ax.grid(True)
+        
+        return fig
+
+def cached_force_diagram(result: Dict[str, Any], cache: Optional[RenderCache] = None) -> go.Figure:
+    """
+    Sơ đồ lực dạng Plotly, lấy từ bộ nhớ đệm hình nếu đã vẽ
     
-    # Đóng figure để tránh rò rỉ bộ nhớ
-    plt.close(fig)
+    Args:
+        result: Kết quả tính toán từ mô-đun PINNs
+        cache: Bộ nhớ đệm hình (nếu None, dùng bộ nhớ đệm chung)
     
-    return img_str
+    Returns:
+        Plotly Figure mới (có thể sửa mà không ảnh hưởng bộ nhớ đệm)
+    """
+    cache = get_render_cache() if cache is None else cache
+    payload = cache.get_or_render(force_diagram_key(result, 'plotly'),
+                                  lambda: create_force_diagram(result, interactive=True).to_json())
+    return _figure_from_json(payload)
+
+def cached_loss_curve(
+    loss_history: List[float],
+    max_points: Optional[int] = LOSS_CURVE_POINTS,
+    epoch_range: Optional[Tuple[int, int]] = None,
+    cache: Optional[RenderCache] = None
+) -> go.Figure:
+    """
+    Biểu đồ hàm mất mát dạng Plotly, lấy từ bộ nhớ đệm hình nếu đã vẽ
+    
+    Args:
+        loss_history: Lịch sử giá trị hàm mất mát
+        max_points: Số điểm tối đa được vẽ (xem plot_loss_curve)
+        epoch_range: Khoảng epoch (đầu, cuối) cần vẽ
+        cache: Bộ nhớ đệm hình (nếu None, dùng bộ nhớ đệm chung)
+    
+    Returns:
+        Plotly Figure mới (có thể sửa mà không ảnh hưởng bộ nhớ đệm)
+    """
+    cache = get_render_cache() if cache is None else cache
+    key = loss_curve_key(loss_history, 'plotly', None, max_points, epoch_range)
+    payload = cache.get_or_render(key, lambda: plot_loss_curve(loss_history, True, max_points, epoch_range).to_json())
+    return _figure_from_json(payload)
+
+def force_diagram_png(result: Dict[str, Any], dpi: int = 100, tight: bool = False,
+                      cache: Optional[RenderCache] = None) -> bytes:
+    """
+    Ảnh PNG của sơ đồ lực (Matplotlib), lấy từ bộ nhớ đệm hình nếu đã vẽ
+    
+    Args:
+        result: Kết quả tính toán từ mô-đun PINNs
+        dpi: Độ phân giải
+        tight: Cắt bỏ lề trắng (bbox_inches='tight')
+        cache: Bộ nhớ đệm hình (nếu None, dùng bộ nhớ đệm chung)
+    
+    Returns:
+        Nội dung ảnh PNG
+    """
+    cache = get_render_cache() if cache is None else cache
+    return cache.get_or_render(force_diagram_key(result, 'png-tight' if tight else 'png', dpi),
+                               lambda: figure_to_png(create_force_diagram(result, interactive=False), dpi, tight))
+
+def loss_curve_png(loss_history: List[float], dpi: int = 100, tight: bool = False,
+                   max_points: Optional[int] = LOSS_CURVE_POINTS,
+                   cache: Optional[RenderCache] = None) -> bytes:
+    """
+    Ảnh PNG của biểu đồ hàm mất mát (Matplotlib), lấy từ bộ nhớ đệm hình nếu đã vẽ
+    
+    Args:
+        loss_history: Lịch sử giá trị hàm mất mát
+        dpi: Độ phân giải
+        tight: Cắt bỏ lề trắng (bbox_inches='tight')
+        max_points: Số điểm tối đa được vẽ (xem plot_loss_curve)
+        cache: Bộ nhớ đệm hình (nếu None, dùng bộ nhớ đệm chung)
+    
+    Returns:
+        Nội dung ảnh PNG
+    """
+    cache = get_render_cache() if cache is None else cache
+    key = loss_curve_key(loss_history, 'png-tight' if tight else 'png', dpi, max_points)
+    return cache.get_or_render(key, lambda: figure_to_png(plot_loss_curve(loss_history, False, max_points), dpi, tight))
+
+def get_dam_section_image(result: Dict[str, Any]) -> str:
+    """
+    Tạo hình ảnh mặt cắt đập và trả về dưới dạng base64 để hiển thị trong HTML
+    
+    Args:
+        result: Kết quả tính toán từ mô-đun PINNs
+        
+    Returns:
+        Chuỗi base64 của hình ảnh
+    """
+    return base64.b64encode(force_diagram_png(result, dpi=100)).decode('utf-8')
 
 def create_excel_report(result: Dict[str, Any]) -> pd.DataFrame:
     """
@@ -321,12 +739,7 @@ def create_pdf_report(result: Dict[str, Any]) -> str:
     dam_img = get_dam_section_image(result)
     
     # Tạo biểu đồ hàm mất mát
-    loss_fig = plot_loss_curve(result['loss_history'], interactive=False)
-    loss_buf = io.BytesIO()
-    loss_fig.savefig(loss_buf, format='png', dpi=100)
-    loss_buf.seek(0)
-    loss_img = base64.b64encode(loss_buf.read()).decode('utf-8')
-    plt.close(loss_fig)
+    loss_img = base64.b64encode(loss_curve_png(result['loss_history'], dpi=100)).decode('utf-8')
     
     # Tạo HTML cho báo cáo
     html = f"""
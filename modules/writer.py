@@ -0,0 +1,149 @@
+"""
+Mô-đun ghi kết quả tính toán vào cơ sở dữ liệu ở luồng nền (write-behind)
+"""
+
+import atexit
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+_STOP = object()
+
+class WriteBehindWriter:
+    """
+    Hàng đợi ghi kết quả vào DamDatabase bằng một luồng riêng
+    
+    submit() chỉ đưa kết quả vào hàng đợi trong bộ nhớ rồi trả về ngay, nên giao diện hiển thị
+    kết quả mà không chờ ghi đĩa. Luồng ghi lấy tất cả kết quả đang chờ (tối đa max_batch) và ghi
+    trong một giao dịch bằng save_results_many; khi tải cao, các kết quả tự gom thành lô lớn hơn.
+    Kết quả chưa ghi vẫn tra cứu được theo input_hash (get_pending), và flush() chờ đến khi mọi
+    kết quả đã gửi trước đó được ghi xong. Khi tiến trình kết thúc, close() được gọi tự động để
+    ghi nốt hàng đợi.
+    """
+    def __init__(self, db: Any, max_batch: int = 500, register_atexit: bool = True):
+        """
+        Args:
+            db: DamDatabase nhận kết quả
+            max_batch: Số kết quả tối đa trong một giao dịch
+            register_atexit: Tự động gọi close() khi tiến trình kết thúc
+        """
+        self.db = db
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._submitted = 0
+        self._processed = 0
+        self._batches = 0
+        self._errors = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='dam-writer', daemon=True)
+        self._thread.start()
+        if register_atexit:
+            atexit.register(self.close)
+
+    def submit(self, result: Dict[str, Any]) -> Future:
+        """
+        Đưa một kết quả vào hàng đợi ghi
+        
+        Args:
+            result: Kết quả tính toán (xem DamDatabase.save_result)
+        
+        Returns:
+            Future trả về ID của bản ghi sau khi đã ghi xong
+        """
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Bộ ghi đã đóng")
+            self._submitted += 1
+            key = result.get('input_hash')
+            if key is not None:
+                self._pending[key] = result
+            self._queue.put((result, future))
+        return future
+
+    def get_pending(self, input_hash: str) -> Optional[Dict[str, Any]]:
+        """Kết quả đang chờ ghi theo mã băm (None nếu không có hoặc đã ghi xong)"""
+        with self._condition:
+            return self._pending.get(input_hash)
+
+    def _run(self) -> None:
+        """Vòng lặp của luồng ghi"""
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self.max_batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = any(item is _STOP for item in items)
+            items = [item for item in items if item is not _STOP]
+            if items:
+                self._write(items)
+            if stop and self._queue.empty():
+                return
+
+    def _write(self, items: List[tuple]) -> None:
+        """Ghi một lô kết quả; nếu cả lô thất bại, ghi lại từng kết quả để cô lập kết quả lỗi"""
+        results = [result for result, _ in items]
+        errors = 0
+        try:
+            ids = self.db.save_results_many(results, chunk_size=len(results))
+            for (_, future), result_id in zip(items, ids):
+                future.set_result(result_id)
+        except Exception:
+            for result, future in items:
+                try:
+                    future.set_result(self.db.save_result(result))
+                except Exception as exc:
+                    errors += 1
+                    future.set_exception(exc)
+        
+        with self._condition:
+            for result in results:
+                key = result.get('input_hash')
+                if key is not None and self._pending.get(key) is result:
+                    del self._pending[key]
+            self._processed += len(items)
+            self._batches += 1
+            self._errors += errors
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Chờ đến khi mọi kết quả đã gửi trước lời gọi này được ghi xong
+        
+        Args:
+            timeout: Thời gian chờ tối đa (giây), None là chờ đến khi xong
+        
+        Returns:
+            True nếu đã ghi xong, False nếu hết thời gian chờ
+        """
+        with self._condition:
+            target = self._submitted
+            return self._condition.wait_for(lambda: self._processed >= target, timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Ghi nốt hàng đợi và dừng luồng ghi (gọi nhiều lần không ảnh hưởng)"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def stats(self) -> Dict[str, float]:
+        """Số kết quả đã gửi, đã ghi, đang chờ, số lô, kích thước lô trung bình và số lỗi"""
+        with self._condition:
+            return {
+                'submitted': self._submitted,
+                'written': self._processed - self._errors,
+                'pending': self._submitted - self._processed,
+                'batches': self._batches,
+                'mean_batch_size': self._processed / self._batches if self._batches else 0.0,
+                'errors': self._errors
+            }